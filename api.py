@@ -0,0 +1,258 @@
+"""Local HTTP print API, served next to the GUI by the same print queue.
+
+    POST /jobs        the body is an image file (anything Pillow reads),
+                      ?text=... adds a caption; or a JSON body
+                      {"text": "...", "image": "<base64>"}, either part optional
+    GET  /jobs/<id>   state of a job submitted here
+    GET  /status      waiting jobs and per-printer statistics
+
+It listens on THERMAL_API_PORT (localhost only) and/or the Unix socket
+THERMAL_API_SOCKET.  The asyncio loop runs on its own thread and only hands
+jobs to the PrintQueue: decoding and dithering happen on the print workers,
+and nothing here touches the Qt event loop.  While THERMAL_API_MAX_PENDING
+jobs wait for a printer, new submissions are answered with 429.  With a
+spool journal a job is only accepted once its record is on disk.
+
+`python api.py` serves the configured printers without the GUI.
+"""
+
+import asyncio
+import base64
+import collections
+import io
+import json
+import os
+import threading
+import urllib.parse
+
+import config
+import printing
+from print_queue import PrintJob
+
+# largest accepted request body
+MAX_BODY = 16 * 1024 * 1024
+# finished jobs are forgotten after this many newer ones
+KEEP_JOBS = 1000
+HEADER_TIMEOUT = 10
+
+REASONS = {
+    200: "OK",
+    202: "Accepted",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    408: "Request Timeout",
+    413: "Payload Too Large",
+    429: "Too Many Requests",
+    500: "Internal Server Error",
+}
+
+
+class HttpError(Exception):
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+def job_status(job):
+    return {
+        "id": job.id,
+        "state": job.state,
+        "detail": job.detail,
+        "attempts": job.attempts,
+        "error": job.error,
+    }
+
+
+class PrintServer:
+    def __init__(self, print_queue, port=None, socket_path=None, host="127.0.0.1", max_pending=None):
+        self.print_queue = print_queue
+        self.port = port
+        self.socket_path = socket_path
+        self.host = host
+        self.max_pending = max_pending or config.API_MAX_PENDING
+        self.jobs = collections.OrderedDict()
+        self.rejected = 0
+        self._loop = None
+        self._stopped = None
+        self._ready = threading.Event()
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name="print-api", daemon=True)
+
+    def start(self):
+        """Start serving, the real port is in `port` afterwards (for port 0)."""
+        self._thread.start()
+        self._ready.wait()
+        if self._error is not None:
+            raise self._error
+        return self
+
+    def stop(self, timeout=5):
+        if self._loop is not None and self._thread.is_alive():
+            self._loop.call_soon_threadsafe(self._stopped.set)
+            self._thread.join(timeout)
+
+    def _run(self):
+        try:
+            asyncio.run(self._serve())
+        except Exception as error:
+            self._error = error
+            self._ready.set()
+
+    async def _serve(self):
+        self._loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+        servers = []
+        if self.port is not None:
+            server = await asyncio.start_server(self._handle, self.host, self.port)
+            self.port = server.sockets[0].getsockname()[1]
+            servers.append(server)
+        if self.socket_path:
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+            servers.append(await asyncio.start_unix_server(self._handle, self.socket_path))
+        self._ready.set()
+        await self._stopped.wait()
+        for server in servers:
+            server.close()
+            await server.wait_closed()
+        if self.socket_path and os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+    async def _handle(self, reader, writer):
+        headers = {}
+        try:
+            status, body, headers = await self._respond(reader)
+        except HttpError as error:
+            status, body, headers = error.status, {"error": str(error)}, error.headers
+        except Exception as error:
+            status, body = 500, {"error": str(error) or type(error).__name__}
+        data = json.dumps(body).encode()
+        head = [
+            f"HTTP/1.1 {status} {REASONS.get(status, '')}",
+            "Content-Type: application/json",
+            f"Content-Length: {len(data)}",
+            "Connection: close",
+        ] + [f"{name}: {value}" for name, value in headers.items()]
+        try:
+            writer.write(("\r\n".join(head) + "\r\n\r\n").encode() + data)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _read_head(self, reader):
+        request_line = await reader.readline()
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        return request_line, headers
+
+    async def _respond(self, reader):
+        try:
+            request_line, headers = await asyncio.wait_for(
+                self._read_head(reader), HEADER_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            raise HttpError(408, "request header timeout")
+        try:
+            method, target, _ = request_line.decode("latin-1").split(" ", 2)
+        except ValueError:
+            raise HttpError(400, "malformed request line")
+        value = headers.get("content-length") or "0"
+        # digits only: int() would also take a sign, spaces and underscores
+        if not (value.isascii() and value.isdigit()):
+            raise HttpError(400, f"bad Content-Length {value!r}")
+        length = int(value)
+        if length > MAX_BODY:
+            raise HttpError(413, f"body larger than {MAX_BODY} bytes")
+        body = await reader.readexactly(length) if length else b""
+        url = urllib.parse.urlsplit(target)
+        query = urllib.parse.parse_qs(url.query)
+        path = url.path.rstrip("/")
+
+        if path == "/jobs":
+            if method != "POST":
+                raise HttpError(405, "use POST", {"Allow": "POST"})
+            job = self._submit(headers, query, body)
+            journal = self.print_queue.journal
+            if journal is not None:
+                await self._loop.run_in_executor(None, journal.wait, job.journal_seq)
+            return 202, job_status(job), {"Location": f"/jobs/{job.id}"}
+        if path.startswith("/jobs/"):
+            try:
+                job = self.jobs[int(path[len("/jobs/"):])]
+            except (KeyError, ValueError):
+                raise HttpError(404, "unknown job")
+            return 200, job_status(job), {}
+        if path == "/status":
+            return 200, {
+                "pending": self.print_queue.pending(),
+                "max_pending": self.max_pending,
+                "rejected": self.rejected,
+                "printers": self.print_queue.stats(),
+            }, {}
+        raise HttpError(404, "not found")
+
+    def _submit(self, headers, query, body):
+        if self.print_queue.pending() >= self.max_pending:
+            self.rejected += 1
+            raise HttpError(429, "print queue is full", {"Retry-After": "5"})
+        text = query.get("text", [None])[0]
+        image = None
+        if headers.get("content-type", "").startswith("application/json"):
+            try:
+                data = json.loads(body or b"{}")
+                text = data.get("text", text)
+                image = base64.b64decode(data["image"]) if data.get("image") else None
+            except (ValueError, TypeError, AttributeError) as error:
+                raise HttpError(400, f"bad JSON body: {error}")
+        elif body:
+            image = body
+        if image is None and not (text and text.strip()):
+            raise HttpError(400, "nothing to print, send an image and/or text")
+        if image is not None:
+            from PIL import Image
+
+            # only the header is parsed here, decoding happens when printing
+            try:
+                size = Image.open(io.BytesIO(image)).size
+            except Exception:
+                raise HttpError(400, "the body is not an image")
+            try:
+                printing.check_size(size)
+            except ValueError as error:
+                raise HttpError(413, str(error))
+        job = self.print_queue.submit(PrintJob(image=image, text=text))
+        self.jobs[job.id] = job
+        while len(self.jobs) > KEEP_JOBS:
+            self.jobs.popitem(last=False)
+        return job
+
+
+def main():
+    from print_queue import PrintQueue
+
+    print_queue = PrintQueue()
+    server = PrintServer(print_queue, config.API_PORT or 8631, config.API_SOCKET).start()
+    where = f"http://127.0.0.1:{server.port}"
+    if config.API_SOCKET:
+        where += f" and {config.API_SOCKET}"
+    print(f"print API on {where}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+        print_queue.stop(timeout=5)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""Load test of the print API against a stand-in printer.
+
+    python bench_api.py [clients] [jobs per client]
+
+Starts a PrintServer on a free port with a FakeEscPosDevice pty as printer,
+then lets many clients submit small JPEGs at once.  Clients that get a 429
+wait for its Retry-After (shortened here) and try again.  Reports submission
+latency, how often backpressure kicked in, the time until every job printed
+and the longest stall of a Qt event loop running in the same process.  A
+last request with a 1x20000 PNG must be refused with 413 before decoding.
+"""
+
+import asyncio
+import io
+import json
+import sys
+import threading
+import time
+
+from PyQt5.QtCore import QCoreApplication, QEventLoop, QTimer
+
+import config
+from api import PrintServer
+from bench_printing import synthetic_frame
+from fakes import FakeEscPosDevice
+from print_queue import DONE, FAILED, EscPosBackend, PrintQueue
+from timing import percentile
+
+
+async def request(port, method, path, body=b"", content_type="image/jpeg"):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    head = (
+        f"{method} {path} HTTP/1.1\r\nHost: localhost\r\n"
+        f"Content-Type: {content_type}\r\nContent-Length: {len(body)}\r\n\r\n"
+    )
+    writer.write(head.encode() + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, data = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(data)
+
+
+async def client(port, image, jobs, latencies, accepted, rejected):
+    for i in range(jobs):
+        start = time.perf_counter()
+        while True:
+            status, body = await request(port, "POST", f"/jobs?text=job+{i}", image)
+            if status != 429:
+                break
+            rejected.append(1)
+            await asyncio.sleep(0.2)
+        latencies.append(time.perf_counter() - start)
+        if status == 202:
+            accepted.append(body["id"])
+
+
+async def load(port, image, clients, jobs):
+    latencies, accepted, rejected = [], [], []
+    await asyncio.gather(
+        *(client(port, image, jobs, latencies, accepted, rejected) for _ in range(clients))
+    )
+    return latencies, accepted, rejected
+
+
+async def wait_done(port, ids):
+    states = {}
+    while len(states) < len(ids):
+        for job_id in ids:
+            if job_id not in states:
+                _, body = await request(port, "GET", f"/jobs/{job_id}")
+                if body["state"] in (DONE, FAILED):
+                    states[job_id] = body["state"]
+        await asyncio.sleep(0.1)
+    return states
+
+
+def main():
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    jobs = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+    app = QCoreApplication(sys.argv)
+    # a fast stand-in, so the run is bounded by the API and not by paper feed
+    config.PRINTER_BAUDRATE = 1000000
+    config.PRINTER_DOT_PRINT_TIME = 0.0002
+    config.PRINTER_DOT_FEED_TIME = 0.0001
+    device = FakeEscPosDevice()
+    print_queue = PrintQueue(EscPosBackend(device.path), cache=None, journal=None)
+    server = PrintServer(print_queue, port=0, max_pending=8).start()
+
+    # a Qt timer that should fire every 10 ms shows whether anything blocks it
+    stalls = [0.0]
+    last = [time.perf_counter()]
+
+    def tick():
+        now = time.perf_counter()
+        stalls[0] = max(stalls[0], now - last[0] - 0.010)
+        last[0] = now
+
+    timer = QTimer(interval=10, timeout=tick)
+    timer.start()
+
+    frame = synthetic_frame(320, 320)
+    data = io.BytesIO()
+    from PIL import Image
+
+    Image.fromarray(frame[..., ::-1]).save(data, "JPEG")
+    image = data.getvalue()
+    data = io.BytesIO()
+    Image.new("L", (1, 20000)).save(data, "PNG")
+    oversized = data.getvalue()
+
+    result = {}
+
+    def run():
+        start = time.perf_counter()
+        result["load"] = asyncio.run(load(server.port, image, clients, jobs))
+        result["submitted"] = time.perf_counter() - start
+        result["states"] = asyncio.run(wait_done(server.port, result["load"][1]))
+        result["printed"] = time.perf_counter() - start
+        result["oversized"] = asyncio.run(
+            request(server.port, "POST", "/jobs", oversized, "image/png")
+        )
+
+    worker = threading.Thread(target=run)
+    worker.start()
+    while worker.is_alive():
+        app.processEvents(QEventLoop.AllEvents, 10)
+        time.sleep(0.001)
+
+    latencies, accepted, rejected = result["load"]
+    done = sum(1 for state in result["states"].values() if state == DONE)
+    print(f"{clients} clients x {jobs} jobs: {len(accepted)} accepted,"
+          f" {len(rejected)} times 429 (queue limit {server.max_pending})")
+    print(f"submission latency incl. retries: p50 {percentile(latencies, 0.5) * 1000:.0f} ms,"
+          f" p95 {percentile(latencies, 0.95) * 1000:.0f} ms")
+    print(f"all submitted after {result['submitted']:.1f} s,"
+          f" {done} printed after {result['printed']:.1f} s")
+    print(f"longest Qt event loop stall: {stalls[0] * 1000:.1f} ms")
+    status, body = result["oversized"]
+    print(f"1x20000 PNG: {status} {body.get('error', body)}")
+    print(print_queue.format_stats())
+    server.stop()
+    print_queue.stop(timeout=5)
+    device.close()
+    return 0 if status == 413 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
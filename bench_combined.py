@@ -0,0 +1,68 @@
+"""Compare the old two-job print path with the single combined job.
+
+Run with `python bench_combined.py [image] [runs]` on the booth.  The old
+path submitted the image and then, one second later, the description as a
+separate text job; the new path renders the description as a caption into
+the image raster.  Both are timed from pressing print until CUPS reports
+every job completed.  Point THERMAL_LP/THERMAL_LPSTAT at stand-ins to run
+it without a printer.
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import config
+import printing
+from bench_printing import synthetic_frame
+from print_queue import CupsBackend, PrintJob
+
+DESCRIPTION = "Bild 18-10-2026\nGrüße aus der Fotobox!"
+# QTimer delays of the old onPrintPhoto -> print_image_func -> print_description_func chain
+OLD_DELAYS = (1.0, 1.0)
+
+
+def two_jobs(image, backend):
+    start = time.monotonic()
+    time.sleep(OLD_DELAYS[0])
+    fd, raster = tempfile.mkstemp(suffix=".pbm")
+    os.close(fd)
+    printing.write_pbm(printing.prepare(image), raster)
+    handles = [backend._lp(printing.lp_raster_options() + [raster])]
+    time.sleep(OLD_DELAYS[1])
+    handles.append(backend._lp([], DESCRIPTION.encode()))
+    backend.wait([h for h in handles if h])
+    os.remove(raster)
+    return time.monotonic() - start
+
+
+def one_job(image, backend):
+    start = time.monotonic()
+    job = PrintJob(image=image, text=DESCRIPTION)
+    backend.wait(backend.send(job, job.render()))
+    return time.monotonic() - start
+
+
+def main():
+    image = sys.argv[1] if len(sys.argv) > 1 and sys.argv[1] else None
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    if image is None:
+        from PIL import Image
+
+        fd, image = tempfile.mkstemp(suffix=".jpg")
+        os.close(fd)
+        Image.fromarray(synthetic_frame(2028, 1520)).save(image)
+    backend = CupsBackend()
+    print(f"lp: {config.LP_COMMAND}, lpstat: {config.LPSTAT_COMMAND}")
+    for name, path in (("two jobs", two_jobs), ("one job", one_job)):
+        times = [path(image, backend) for _ in range(runs)]
+        print(f"{name:>10}: {min(times):6.2f} s best, {sum(times) / runs:6.2f} s mean")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except (OSError, subprocess.CalledProcessError) as error:
+        sys.exit(f"spooler not reachable: {error}")
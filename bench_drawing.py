@@ -0,0 +1,150 @@
+"""Headless benchmark of the Drawing canvas.
+
+Run with `QT_QPA_PLATFORM=offscreen python bench_drawing.py`.  Feeds a burst
+of synthetic touch moves into a Drawing on a full resolution still shown at
+the 3.5" screen size and reports move events per second and the time spent
+per painted frame.  Also checks that a stroke is inked on the image and on
+the display where its events were sent, also after an undo and a redo.
+"""
+
+import math
+import sys
+import time
+
+import numpy as np
+from PyQt5.QtCore import QEvent, QPoint, QPointF, Qt
+from PyQt5.QtGui import QImage, QMouseEvent
+from PyQt5.QtWidgets import QApplication
+
+from drawing import Drawing
+
+SCREEN = (480, 320)
+IMAGE = (4056, 3040)
+
+
+def mouse(kind, pos, buttons=Qt.LeftButton):
+    button = Qt.LeftButton if kind != QEvent.MouseMove else Qt.NoButton
+    return QMouseEvent(kind, QPointF(pos), button, buttons, Qt.NoModifier)
+
+
+class TimedDrawing(Drawing):
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.frame_times = []
+
+    def paintEvent(self, event):
+        start = time.perf_counter()
+        super().paintEvent(event)
+        self.frame_times.append(time.perf_counter() - start)
+
+
+def run(events=2000):
+    """Return events/s and frame times for `events` synthetic touch moves."""
+    app = QApplication.instance() or QApplication(sys.argv)
+    image = QImage(*IMAGE, QImage.Format.Format_RGB32)
+    image.fill(Qt.white)
+    canvas = TimedDrawing("", image)
+    canvas.resize(*SCREEN)
+    canvas.show()
+    app.processEvents()
+    canvas.frame_times.clear()
+
+    start = time.perf_counter()
+    app.sendEvent(canvas, mouse(QEvent.MouseButtonPress, QPoint(20, 160)))
+    for i in range(events):
+        x = 20 + (i * 0.2) % 440
+        y = 160 + 120 * math.sin(i / 40)
+        app.sendEvent(canvas, mouse(QEvent.MouseMove, QPoint(int(x), int(y))))
+        # a touch screen delivers several moves per 16 ms frame
+        if i % 8 == 7:
+            canvas.flushStroke()
+            canvas.repaint()
+    app.sendEvent(canvas, mouse(QEvent.MouseButtonRelease, QPoint(int(x), int(y)), Qt.NoButton))
+    canvas.repaint()
+    elapsed = time.perf_counter() - start
+
+    frames = sorted(canvas.frame_times) or [0.0]
+    canvas.close()
+    canvas.deleteLater()
+    return {
+        "events": events,
+        "events_per_sec": events / elapsed,
+        "frames": len(canvas.frame_times),
+        "frame_ms_mean": sum(frames) / len(frames) * 1000,
+        "frame_ms_p95": frames[int(len(frames) * 0.95)] * 1000,
+    }
+
+
+def inked(image):
+    """Row and column ranges of the dark pixels of `image`, None if blank."""
+    image = image.convertToFormat(QImage.Format.Format_Grayscale8)
+    bits = image.constBits()
+    bits.setsize(image.bytesPerLine() * image.height())
+    gray = np.frombuffer(bits, np.uint8).reshape(image.height(), image.bytesPerLine())
+    rows, cols = np.nonzero(gray[:, : image.width()] < 128)
+    if not len(rows):
+        return None
+    return (rows.min(), rows.max()), (cols.min(), cols.max())
+
+
+def check_ink():
+    """Draw a line across the screen and check where it lands, returns errors."""
+    app = QApplication.instance() or QApplication(sys.argv)
+    image = QImage(*IMAGE, QImage.Format.Format_RGB32)
+    image.fill(Qt.white)
+    canvas = Drawing("", image)
+    canvas.resize(*SCREEN)
+    canvas.show()
+    app.processEvents()
+
+    # near the bottom right, where a wrong y scale is furthest off
+    y, x0, x1 = 300, 40, 440
+    app.sendEvent(canvas, mouse(QEvent.MouseButtonPress, QPoint(x0, y)))
+    for x in range(x0, x1 + 1, 20):
+        app.sendEvent(canvas, mouse(QEvent.MouseMove, QPoint(x, y)))
+    app.sendEvent(canvas, mouse(QEvent.MouseButtonRelease, QPoint(x1, y), Qt.NoButton))
+    sx, sy = IMAGE[0] / SCREEN[0], IMAGE[1] / SCREEN[1]
+    slack = canvas.brushSize * max(sx, sy)
+
+    errors = []
+
+    def expect(name, found, scale_x, scale_y, slack):
+        if found is None:
+            errors.append(f"{name}: nothing inked")
+            return
+        (top, bottom), (left, right) = found
+        if abs((top + bottom) / 2 - y * scale_y) > slack:
+            errors.append(f"{name}: rows {top}-{bottom}, expected about {y * scale_y:.0f}")
+        if abs(left - x0 * scale_x) > slack or abs(right - x1 * scale_x) > slack:
+            errors.append(f"{name}: columns {left}-{right},"
+                          f" expected about {x0 * scale_x:.0f}-{x1 * scale_x:.0f}")
+
+    expect("image", inked(canvas.image), sx, sy, slack)
+    expect("display", inked(canvas.display.toImage()), 1, 1, canvas.brushSize + 1)
+    canvas.undo()
+    if inked(canvas.display.toImage()) is not None:
+        errors.append("display after undo: stroke still shown")
+    canvas.redo()
+    expect("display after redo", inked(canvas.display.toImage()), 1, 1, canvas.brushSize + 1)
+    canvas.close()
+    canvas.deleteLater()
+    return errors
+
+
+def main():
+    events = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    result = run(events)
+    print(
+        f"{events} move events: {result['events_per_sec']:.0f} events/s, "
+        f"{result['frames']} frames, mean {result['frame_ms_mean']:.2f} ms,"
+        f" p95 {result['frame_ms_p95']:.2f} ms"
+    )
+    errors = check_ink()
+    for error in errors:
+        print("INK", error)
+    print("ink lands where the events were sent" if not errors else "FAILED")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,54 @@
+"""Measure the direct ESC/POS backend against a pty stand-in printer.
+
+Run with `python bench_escpos.py [baudrate]`.  The slave side of a pty is
+drained by a thread, so the numbers show encoding plus pacing cost: bytes/sec
+and time-to-first-line for streamed bands versus dithering the whole image
+before sending anything.
+"""
+
+import os
+import sys
+import threading
+
+import printing
+from bench_printing import synthetic_frame
+from escpos import EscPosPrinter, PrintStats
+
+
+def drain(fd, counter):
+    while True:
+        try:
+            data = os.read(fd, 65536)
+        except OSError:
+            return
+        if not data:
+            return
+        counter[0] += len(data)
+
+
+def main():
+    baudrate = int(sys.argv[1]) if len(sys.argv) > 1 else 115200
+    master, slave = os.openpty()
+    received = [0]
+    threading.Thread(target=drain, args=(master, received), daemon=True).start()
+    device = os.ttyname(slave)
+    frame = synthetic_frame(2028, 1520)
+
+    # a fast serial link with short dot times, so pacing does not dominate
+    printer = EscPosPrinter(device, baudrate, "none", dot_print_time=0.0005, dot_feed_time=0.0001)
+    with printer:
+        stats = printer.print_image(frame, order="BGR")
+        print(f"streamed bands:  {stats}")
+
+        printer.wait_idle()
+        stats = PrintStats()
+        bits = printing.prepare(frame, order="BGR")
+        bands = [bits[y : y + 24] for y in range(0, len(bits), 24)]
+        stats = printer.print_raster(bands, stats=stats)
+        print(f"whole image:     {stats}")
+    os.close(slave)
+    print(f"pty received {received[0]} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Headless benchmark of opening the description dialog.
+
+Run with `QT_QPA_PLATFORM=offscreen python bench_keyboard.py [opens]`.
+Reports the first open, which builds the keyboard, and later opens, which
+reuse it, in milliseconds, and the latency of a keystroke including the
+preview repaint as the description grows.
+"""
+
+import sys
+import time
+
+from PyQt5.QtWidgets import QApplication
+
+from keyboard import DescriptionDialog
+
+
+def open_dialog(app, dialog, description):
+    start = time.perf_counter()
+    if dialog is None:
+        dialog = DescriptionDialog(description)
+    else:
+        dialog.set_description(description)
+    dialog.show()
+    app.processEvents()
+    elapsed = time.perf_counter() - start
+    dialog.hide()
+    return dialog, elapsed
+
+
+def keystroke_latency(app, dialog, lengths=(10, 100, 1000, 5000), samples=50):
+    """Return milliseconds per keystroke (with preview repaint) by text length."""
+    results = {}
+    dialog.set_description("")
+    dialog.show()
+    typed = 0
+    text = "Grüße aus der Fotobox, schön daß ihr da seid! "
+    for length in lengths:
+        while typed < length:
+            dialog.button_clicked(text[typed % len(text)])
+            typed += 1
+        start = time.perf_counter()
+        for i in range(samples):
+            dialog.button_clicked(text[i % len(text)])
+            dialog.description_box.repaint()
+        for i in range(samples):
+            dialog.button_clicked("<--")
+        results[length] = (time.perf_counter() - start) / samples * 1000
+    dialog.hide()
+    return results
+
+
+def run(opens=20):
+    app = QApplication.instance() or QApplication(sys.argv)
+    dialog, first = open_dialog(app, None, "Bild 0")
+    times = []
+    for i in range(opens):
+        dialog, elapsed = open_dialog(app, dialog, f"Bild {i + 1}")
+        times.append(elapsed)
+    times.sort()
+    result = {
+        "first_open_ms": first * 1000,
+        "reopen_ms_median": times[len(times) // 2] * 1000,
+        "reopen_ms_max": times[-1] * 1000,
+        "keystroke_ms": keystroke_latency(app, dialog),
+    }
+    dialog.deleteLater()
+    return result
+
+
+def main():
+    opens = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    result = run(opens)
+    print(f"first open (builds keyboard): {result['first_open_ms']:.1f} ms")
+    print(
+        f"reopen: median {result['reopen_ms_median']:.2f} ms,"
+        f" max {result['reopen_ms_max']:.2f} ms over {opens} opens"
+    )
+    for length, ms in result["keystroke_ms"].items():
+        print(f"keystroke at {length:5d} chars: {ms:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
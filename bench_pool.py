@@ -0,0 +1,79 @@
+"""Throughput and failover of the printer pool with stand-in printers.
+
+    python bench_pool.py [jobs]
+
+Prints the same jobs on one and on three FakeEscPosDevice ptys, paced like a
+real printer at 115200 baud with short dot times, then runs out of paper on
+one printer halfway through the pool run to show that its jobs move on to
+the others.  Per-printer throughput is printed for every run.  Last, one
+and two printers that never answer status queries must print as fast as
+answering ones, a query is not waited out before every job.
+"""
+
+import sys
+import time
+
+from PyQt5.QtCore import QCoreApplication, QEventLoop
+
+import config
+from bench_printing import synthetic_frame
+from fakes import FakeEscPosDevice
+from print_queue import DONE, FAILED, EscPosBackend, PrintJob, PrintQueue
+
+
+def run(app, printers, jobs, paper_out_after=None, silent=False):
+    devices = [FakeEscPosDevice() for _ in range(printers)]
+    for device in devices:
+        device.silent = silent
+    pool = PrintQueue(
+        [EscPosBackend(d.path) for d in devices], cache=None, retry_delay=0.2, journal=None
+    )
+    states = {}
+    moved = []
+
+    def changed(job_id, state, detail):
+        states[job_id] = state
+        if "moved to" in detail:
+            moved.append(detail)
+
+    pool.job_changed.connect(changed)
+    frame = synthetic_frame(640, 480)
+    start = time.monotonic()
+    for i in range(jobs):
+        pool.submit(PrintJob(image=frame, text=f"job {i}", order="BGR"))
+        if i + 1 == paper_out_after:
+            devices[0].paper_out = True
+    while sum(1 for state in states.values() if state in (DONE, FAILED)) < jobs:
+        app.processEvents(QEventLoop.AllEvents, 50)
+        time.sleep(0.01)
+    elapsed = time.monotonic() - start
+    done = sum(1 for state in states.values() if state == DONE)
+    print(f"{printers}{' silent' if silent else ''} printer(s): {done}/{jobs} printed in {elapsed:.1f} s"
+          f" ({done / elapsed * 60:.0f}/min)")
+    print("  " + pool.format_stats().replace("\n", "\n  "))
+    if moved:
+        print(f"  {len(moved)} job(s) failed over, e.g. {moved[0]}")
+    pool.stop(timeout=5)
+    for device in devices:
+        device.close()
+    return elapsed
+
+
+def main():
+    jobs = int(sys.argv[1]) if len(sys.argv) > 1 else 9
+    app = QCoreApplication(sys.argv)
+    config.PRINTER_BAUDRATE = 115200
+    config.PRINTER_DOT_PRINT_TIME = 0.002
+    config.PRINTER_DOT_FEED_TIME = 0.0005
+    single = run(app, 1, jobs)
+    pool = run(app, 3, jobs)
+    print(f"speedup with 3 printers: {single / pool:.1f}x")
+    run(app, 3, jobs, paper_out_after=jobs // 2)
+    silent_single = run(app, 1, jobs, silent=True)
+    silent_pool = run(app, 2, jobs, silent=True)
+    print(f"silent printers: {(silent_single - single) / jobs * 1000:+.0f} ms per job alone,"
+          f" {(silent_pool - run(app, 2, jobs)) / jobs * 1000:+.0f} ms per job in a pool of 2")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Benchmark the print preparation pipeline at typical camera resolutions.
+
+Run with `python bench_printing.py [repeats]`, prints milliseconds per image
+for every dither method, from a frame array and from a JPEG file.
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import printing
+
+RESOLUTIONS = [(640, 480), (1536, 864), (2028, 1520), (4056, 3040)]
+
+
+def synthetic_frame(width, height):
+    # a smooth gradient with some noise resembles a photo better than pure noise
+    rng = np.random.default_rng(0)
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    base = (x + y) / 2 + rng.normal(0, 12, (height, width)).astype(np.float32)
+    frame = np.clip(base, 0, 255).astype(np.uint8)
+    return np.dstack([frame, np.roll(frame, 7, axis=1), frame[::-1]])
+
+
+def time_ms(func, repeats):
+    func()
+    start = time.perf_counter()
+    for _ in range(repeats):
+        func()
+    return (time.perf_counter() - start) * 1000 / repeats
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    try:
+        from PIL import Image
+    except ImportError:
+        Image = None
+
+    print(f"{'source':>18} {'method':>16} {'ms/image':>10}")
+    for width, height in RESOLUTIONS:
+        frame = synthetic_frame(width, height)
+        jpeg = None
+        if Image is not None:
+            fd, jpeg = tempfile.mkstemp(suffix=".jpg")
+            os.close(fd)
+            Image.fromarray(frame).save(jpeg, quality=90)
+        for method in printing.DITHER_METHODS:
+            ms = time_ms(lambda: printing.prepare(frame, method=method, order="BGR"), repeats)
+            print(f"{f'array {width}x{height}':>18} {method:>16} {ms:10.1f}")
+            if jpeg:
+                ms = time_ms(lambda: printing.prepare(jpeg, method=method), repeats)
+                print(f"{f'jpeg {width}x{height}':>18} {method:>16} {ms:10.1f}")
+        if jpeg:
+            os.remove(jpeg)
+
+
+if __name__ == "__main__":
+    main()
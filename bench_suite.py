@@ -0,0 +1,218 @@
+"""Headless benchmark suite for the whole booth.
+
+Runs MainWindow under the offscreen Qt platform with FakePicamera2 and the
+fake_lp.py spooler, so it works on any Linux box:
+
+    python bench_suite.py [-o results.json] [--compare previous.json]
+
+Covers startup, countdown-to-capture and shutter lag in both capture modes,
+capture-to-print-submission, print preparation, reprints with and without
+the raster cache, Drawing stroke throughput, DescriptionDialog open time and
+keystroke latency.  Results are written as JSON, and --compare prints the
+change of every number against an earlier run, e.g. from the previous commit.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtCore import QEventLoop
+from PyQt5.QtWidgets import QApplication
+
+import bench_drawing
+import bench_keyboard
+import camera
+import config
+import printing
+from bench_printing import synthetic_frame
+from fakes import FakePicamera2, FakeQGlPicamera2, fake_cups_backend
+
+
+def wait_for(app, predicate, timeout=30):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise TimeoutError("benchmark step did not finish")
+        app.processEvents(QEventLoop.AllEvents, 10)
+        time.sleep(0.001)
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2] if values else None
+
+
+def bench_window(app, mode, shots, lp_log, switch_delay):
+    config.CAPTURE_MODE = mode
+    start = time.monotonic()
+    window = camera.MainWindow(
+        camera_factory=lambda: FakePicamera2(switch_delay=switch_delay),
+        preview_factory=FakeQGlPicamera2,
+        print_backend=fake_cups_backend(lp_log),
+    )
+    window.show()
+    wait_for(app, lambda: window.time_to_first_frame is not None)
+    result = {
+        "window_ms": (camera.STARTED + window.time_to_window - start) * 1000,
+        "first_frame_ms": (camera.STARTED + window.time_to_first_frame - start) * 1000,
+    }
+
+    states = {}
+    window.print_queue.job_changed.connect(
+        lambda job_id, state, detail: states.setdefault((job_id, state), time.monotonic())
+    )
+    countdown, submission = [], []
+    for _ in range(shots):
+        pressed = time.monotonic()
+        window.take_picture()
+        wait_for(app, lambda: window._take_picture_action.isEnabled())
+        countdown.append(time.monotonic() - pressed)
+
+        printed = time.monotonic()
+        window.onPrintPhoto()
+        job_id = max(job for job, _ in states)
+        wait_for(app, lambda: (job_id, "sent") in states)
+        submission.append(states[(job_id, "sent")] - printed)
+        wait_for(app, lambda: (job_id, "done") in states)
+
+    result.update(
+        countdown_to_capture_ms=median(countdown) * 1000,
+        shutter_lag_ms=median(window.shutter_lags) * 1000,
+        capture_to_print_submission_ms=median(submission) * 1000,
+    )
+    window.print_queue.stop(timeout=5)
+    window.close()
+    window.deleteLater()
+    return result
+
+
+def bench_prepare(repeats=3):
+    frame = synthetic_frame(2028, 1520)
+    result = {}
+    for method in printing.DITHER_METHODS:
+        printing.prepare(frame, method=method, order="BGR")
+        start = time.perf_counter()
+        for _ in range(repeats):
+            printing.prepare(frame, method=method, order="BGR")
+        result[method] = (time.perf_counter() - start) / repeats * 1000
+    return result
+
+
+def bench_reprint(repeats=5):
+    """Preparing a print job's raster on a cache miss and on a hit."""
+    from print_queue import PrintJob, PrintQueue
+    from raster_cache import RasterCache
+
+    class NullBackend:
+        name = "null"
+
+        def send(self, job, bands):
+            for _ in bands:
+                pass
+
+        def wait(self, handle):
+            pass
+
+    frame = synthetic_frame(1640, 1232)
+    queue = PrintQueue(NullBackend(), cache=RasterCache(tempfile.mkdtemp()), journal=None)
+    result = {}
+    for name in ("miss", "hit"):
+        start = time.perf_counter()
+        for i in range(repeats):
+            text = f"copy {i}" if name == "miss" else "copy 0"
+            job = PrintJob(image=frame, text=text, order="BGR")
+            bands, _, keep = queue._bands(job)
+            queue.backend.send(job, bands)
+            if keep is not None:
+                keep()
+        result[name] = (time.perf_counter() - start) / repeats * 1000
+    queue.stop(timeout=1)
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except OSError:
+        return ""
+
+
+def flatten(tree, prefix=""):
+    for key, value in tree.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            yield from flatten(value, name + ".")
+        elif isinstance(value, (int, float)):
+            yield name, value
+
+
+def compare(current, previous):
+    before = dict(flatten(previous["results"]))
+    print(f"\ncompared with {previous.get('commit') or 'previous run'}:")
+    for name, value in flatten(current["results"]):
+        if name in before and before[name]:
+            change = (value - before[name]) / before[name] * 100
+            print(f"{name:>55} {before[name]:10.2f} -> {value:10.2f} ({change:+.0f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-o", "--output", default="bench_results.json")
+    parser.add_argument("--compare", help="earlier results JSON to compare with")
+    parser.add_argument("--shots", type=int, default=3)
+    parser.add_argument("--switch-delay", type=float, default=0.4,
+                        help="simulated sensor mode switch in seconds")
+    args = parser.parse_args()
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    config.ARCHIVE_CAPTURES = False
+    # every fake shot has the same content, each one is measured uncached
+    config.RASTER_CACHE_DIR = ""
+    # journaled like on the booth, but not into its spool
+    config.SPOOL_DIR = tempfile.mkdtemp()
+    fd, lp_log = tempfile.mkstemp(suffix=".jsonl")
+    os.close(fd)
+    results = {
+        mode: bench_window(app, mode, args.shots, lp_log, args.switch_delay)
+        for mode in ("switch", "dual", "zsl")
+    }
+    results["prepare_ms"] = bench_prepare()
+    results["reprint_ms"] = bench_reprint()
+    results["drawing"] = bench_drawing.run()
+    results["description_dialog"] = bench_keyboard.run()
+    with open(lp_log) as log:
+        # fake_lp also logs the release of every held job
+        results["spooled_jobs"] = sum(1 for line in log if '"resume"' not in line)
+    os.remove(lp_log)
+
+    report = {
+        "commit": git_commit(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "results": results,
+    }
+    with open(args.output, "w") as file:
+        json.dump(report, file, indent=2)
+    for name, value in flatten(results):
+        print(f"{name:>55} {value:10.2f}")
+    print(f"written to {args.output}")
+    if args.compare:
+        with open(args.compare) as file:
+            compare(report, json.load(file))
+
+
+if __name__ == "__main__":
+    main()
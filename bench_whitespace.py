@@ -0,0 +1,110 @@
+"""Bytes and printer time saved by sending blank rows as paper feed.
+
+    python bench_whitespace.py
+
+Renders a typical drawing (a few strokes on the blank canvas of
+onDrawImage) and a photo job, both with caption, and writes them with
+EscPosPrinter to a scratch file with and without trimming.  Seconds are
+modeled with the printer's pacing parameters: bytes at the baud rate, dot
+rows at PRINTER_DOT_PRINT_TIME and fed rows at PRINTER_DOT_FEED_TIME.  The
+trimmed command stream is decoded again to check that it prints the same
+dots.
+"""
+
+import os
+import tempfile
+
+import numpy as np
+
+import config
+import printing
+from bench_printing import synthetic_frame
+from escpos import ESC, GS, EscPosPrinter
+from print_queue import PrintJob
+
+
+def drawing_canvas(w=640, h=480):
+    from PIL import Image, ImageDraw
+
+    img = Image.new("RGB", (w, h), "white")
+    draw = ImageDraw.Draw(img)
+    draw.line([(80, 60), (300, 120), (420, 90)], fill="black", width=6)
+    draw.ellipse([(200, 220), (320, 340)], outline="black", width=5)
+    draw.line([(500, 380), (560, 430)], fill="black", width=4)
+    return np.asarray(img)
+
+
+def modeled_seconds(printer, stats):
+    return (
+        stats.bytes_sent * printer.byte_time
+        + stats.rows_printed * printer.dot_print_time
+        + stats.rows_fed * printer.dot_feed_time
+    )
+
+
+def decode(data, width=printing.PRINTER_DOTS):
+    """Rebuild the printed dots from a command stream (INIT, GS v 0, ESC J, GS L)."""
+    rows, y, margin, i = [], 0, 0, 0
+    page = {}
+    while i < len(data):
+        if data[i : i + 2] == ESC + b"@":
+            i += 2
+        elif data[i : i + 3] == GS + b"v0":
+            wb, h = data[i + 4] | data[i + 5] << 8, data[i + 6] | data[i + 7] << 8
+            bits = np.unpackbits(
+                np.frombuffer(data[i + 8 : i + 8 + wb * h], np.uint8).reshape(h, wb), axis=1
+            ).astype(bool)
+            for r in range(h):
+                row = np.zeros(width, dtype=bool)
+                row[margin : margin + wb * 8] = bits[r][: width - margin]
+                page[y + r] = row
+            y += h
+            i += 8 + wb * h
+        elif data[i : i + 2] == ESC + b"J":
+            y += data[i + 2]
+            i += 3
+        elif data[i : i + 2] == GS + b"L":
+            margin = data[i + 2] | data[i + 3] << 8
+            i += 4
+        elif data[i : i + 2] == ESC + b"d":
+            i += 3
+        else:
+            raise ValueError(f"unexpected byte {data[i]:#x} at {i}")
+    out = np.zeros((max(page) + 1 if page else 0, width), dtype=bool)
+    for r, row in page.items():
+        out[r] = row
+    return out
+
+
+def run(name, job):
+    bits = np.concatenate(list(job.render()))
+    results = {}
+    for trim in (False, True):
+        fd, path = tempfile.mkstemp(suffix=".bin")
+        os.close(fd)
+        # flow control so nothing sleeps here, the time is modeled instead
+        printer = EscPosPrinter(path, flow_control="rtscts", trim=trim, trim_left=trim)
+        with printer:
+            stats = printer.print_raster([bits[y : y + 24] for y in range(0, len(bits), 24)])
+        with open(path, "rb") as file:
+            data = file.read()
+        os.remove(path)
+        # the same dots, only the blank rows at the end are left to the final feed
+        printed = decode(data)
+        assert (printed == bits[: len(printed)]).all() and not bits[len(printed) :].any()
+        results[trim] = (stats.bytes_sent, modeled_seconds(printer, stats))
+    (b0, s0), (b1, s1) = results[False], results[True]
+    print(f"{name:>8}: {b0:7d} -> {b1:7d} bytes ({(b1 - b0) / b0:+.0%}),"
+          f" {s0:5.1f} -> {s1:5.1f} s ({(s1 - s0) / s0:+.0%})")
+
+
+def main():
+    print(f"{config.PRINTER_BAUDRATE} baud, {config.PRINTER_DOT_PRINT_TIME * 1000:.1f} ms"
+          f" per printed and {config.PRINTER_DOT_FEED_TIME * 1000:.1f} ms per fed dot row")
+    run("drawing", PrintJob(image=drawing_canvas(), text="Bild 18-10-2026"))
+    run("photo", PrintJob(image=synthetic_frame(2028, 1520), text="Bild 18-10-2026", order="BGR"))
+    run("text", PrintJob(text="# Hochzeit\nAnna & Ben\n\n\n18-10-2026"))
+
+
+if __name__ == "__main__":
+    main()
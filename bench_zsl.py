@@ -0,0 +1,101 @@
+"""Sharpest-frame selection and cost of the zero-shutter-lag ring buffer.
+
+    python bench_zsl.py [width height]
+
+Builds a scene with edges and text at the capture size, makes defocused
+and motion-blurred variants of it, pushes them into a FrameRing in a
+shuffled order and checks that the sharp frame is picked.  Reports the
+ring size for the configured budget, the time per pushed frame (copy and
+score, the work the ZslWorker does per frame), the time to pick at the
+shutter and how much Python allocates while frames are pushed.
+"""
+
+import random
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+import config
+from zsl import FrameRing
+
+
+def scene(width, height):
+    from PIL import Image, ImageDraw
+
+    img = Image.new("RGB", (width, height), (200, 190, 170))
+    draw = ImageDraw.Draw(img)
+    rng = random.Random(0)
+    for _ in range(60):
+        x, y = rng.randrange(width), rng.randrange(height)
+        size = rng.randrange(20, width // 6)
+        color = tuple(rng.randrange(256) for _ in range(3))
+        if rng.random() < 0.5:
+            draw.rectangle([x, y, x + size, y + size // 2], fill=color)
+        else:
+            draw.ellipse([x, y, x + size, y + size], outline=color, width=4)
+    for row in range(0, height, height // 12):
+        draw.text((20, row), "Photo booth " * 8, fill=(0, 0, 0))
+    return img
+
+
+def motion_blur(frame, length):
+    # the average of shifted copies, like a horizontal shake during exposure
+    acc = np.zeros(frame.shape, dtype=np.float32)
+    for shift in range(length):
+        acc += np.roll(frame, shift, axis=1)
+    return (acc / length).astype(np.uint8)
+
+
+def main():
+    from PIL import ImageFilter
+
+    width, height = (int(v) for v in sys.argv[1:3]) if len(sys.argv) > 2 else config.CAPTURE_SIZE
+    img = scene(width, height)
+    # BGR, like the RGB888 stream
+    sharp = np.ascontiguousarray(np.asarray(img)[..., ::-1])
+    variants = {"sharp": sharp}
+    for radius in (1, 2, 4):
+        blurred = np.asarray(img.filter(ImageFilter.GaussianBlur(radius)))
+        variants[f"defocus {radius}px"] = np.ascontiguousarray(blurred[..., ::-1])
+    for length in (3, 8):
+        variants[f"motion {length}px"] = motion_blur(sharp, length)
+
+    # room for all variants, so the pick sees every one of them
+    ring = FrameRing(sharp.shape, sharp.dtype, len(variants) * sharp.nbytes)
+    names = list(variants)
+    random.Random(1).shuffle(names)
+    for name in names:
+        ring.push(variants[name])
+    frame, score, _ = ring.best()
+    picked = next(name for name in names if np.array_equal(variants[name], frame))
+    scores = {name: ring.sharpness(variants[name]) for name in variants}
+    print(f"{width}x{height}: picked '{picked}' from {len(names)} frames")
+    for name in sorted(scores, key=scores.get, reverse=True):
+        print(f"  {name:14s} sharpness {scores[name]:8.1f}")
+
+    budget_ring = FrameRing(sharp.shape, sharp.dtype, config.ZSL_BUFFER_BYTES)
+    print(f"budget {config.ZSL_BUFFER_BYTES // (1024 * 1024)} MB keeps {budget_ring.size} frames"
+          f" ({budget_ring.nbytes / (1024 * 1024):.1f} MB preallocated)")
+    frames = [variants[name] for name in names]
+    pushes = 100
+    tracemalloc.start()
+    start = time.perf_counter()
+    for i in range(pushes):
+        budget_ring.push(frames[i % len(frames)])
+    push_ms = (time.perf_counter() - start) * 1000 / pushes
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    start = time.perf_counter()
+    for _ in range(20):
+        budget_ring.best()
+    pick_ms = (time.perf_counter() - start) * 1000 / 20
+    print(f"push (copy + score): {push_ms:.1f} ms/frame, peak allocation while pushing"
+          f" {peak / 1024:.0f} KB (a frame is {sharp.nbytes / 1024:.0f} KB)")
+    print(f"pick at the shutter: {pick_ms:.1f} ms")
+    return 0 if picked == "sharp" else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,68 +1,93 @@
 """PyQt5 Multimedia Camera Example"""
 
+import collections
 import os
 import sys
-from PyQt5.QtCore import QDate, QTime, QDir, Qt, QUrl, QTimer, QSize
-from PyQt5.QtGui import QGuiApplication, QDesktopServices, QIcon
-from PyQt5.QtGui import QImage, QPixmap
+import time
+
+# process start, for the time-to-window and time-to-first-frame report
+STARTED = time.monotonic()
+
+from PyQt5.QtCore import QDate, Qt, QTimer, QSize, QThread, pyqtSignal
+from PyQt5.QtGui import QIcon, QImage
 from PyQt5.QtWidgets import (
     QApplication,
     QAction,
     QLabel,
     QMainWindow,
-    QTabWidget,
+    QStackedWidget,
     QToolBar,
-    QVBoxLayout,
-    QWidget,
-    QTabBar,
-)
-from PyQt5.QtMultimedia import (
-    QCamera,
-    QCameraInfo,
-    QCameraImageCapture,
 )
-from PyQt5.QtMultimediaWidgets import QCameraViewfinder
-from keyboard import DescriptionDialog
-from drawing import Drawing
-from picamera2 import Picamera2
-from picamera2.previews.qt import QGlPicamera2
+import config
+import timing
 
+# drawing, keyboard, picamera2 and the print pipeline (numpy) are imported
+# where they are first used, so the window shows up without waiting for them
 
-class ImageView(QWidget):
-    def __init__(self, previewImage, fileName, description):
-        super().__init__()
 
-        self._file_name = fileName
-        self.printing_status = ""
-        main_layout = QVBoxLayout(self)
-        self._image_label = QLabel()
-        self._image_label.setPixmap(QPixmap.fromImage(previewImage))
-        main_layout.addWidget(self._image_label)
-        self._file_name_label = QLabel(QDir.toNativeSeparators(fileName))
-        self.description = QLabel(description)
+class CameraStarter(QThread):
+    """Discovers and configures the camera off the GUI thread."""
+
+    ready = pyqtSignal(object)
+    failed = pyqtSignal(str)
 
-        main_layout.addWidget(self._file_name_label)
-        main_layout.addWidget(self.description)
-        main_layout.setSpacing(0)
-        main_layout.addStretch(10)
+    def __init__(self, configure, factory=None, parent=None):
+        super().__init__(parent)
+        self.configure = configure
+        self.factory = factory
 
-    def copy(self):
-        QGuiApplication.clipboard().setText(self._file_name_label.text())
+    def run(self):
+        try:
+            if self.factory is None:
+                from picamera2 import Picamera2
 
-    def launch(self):
-        QDesktopServices.openUrl(QUrl.fromLocalFile(self._file_name))
+                self.factory = Picamera2
+            picam2 = self.factory()
+            picam2.configure(self.configure(picam2))
+        except Exception as error:
+            # no camera connected, or libcamera not available
+            self.failed.emit(str(error) or type(error).__name__)
+            return
+        self.ready.emit(picam2)
 
 
 class MainWindow(QMainWindow):
-    def __init__(self):
+    # emitted from the camera thread once the first preview frame arrived
+    first_frame = pyqtSignal()
+
+    def __init__(self, camera_factory=None, preview_factory=None, print_backend=None):
         super().__init__()
 
-        self._camera = None
+        # stand-ins for Picamera2, QGlPicamera2 and the print backend can be
+        # passed in to run the booth without the hardware
+        self._preview_factory = preview_factory
+        self._print_backend = print_backend
         self.picam2 = None
-        self._camera_info = None
-        self._image_capture = None
+        self.qpicamera2 = None
+        self.time_to_window = None
+        self.time_to_first_frame = None
         self.counter = 3
         self._file_name = ""
+        # the last still as an array in Picamera2's BGR order
+        self._frame = None
+        # the frame at the printer's resolution, when a drawing rendered one
+        self._print_frame = None
+        self._shutter_pressed = None
+        self._countdown_span = self._capture_span = timing.NULL_SPAN
+        self._description_dialog = None
+        self._strip_worker = None
+        self._viewfinder = None
+        self._zsl = None
+        self._api = None
+        # the latest shutter lags, bounded for sessions of thousands of shots
+        self.shutter_lags = collections.deque(maxlen=100)
+        self._archive = None
+        self._print_queue = None
+        self._session = None
+        # the print job rendered speculatively for the current photo
+        self._prepared_job = None
+        # index of the current photo in the session store, if it was archived
+        self._photo_id = None
         date_string = QDate.currentDate().toString("dd-MM-yyyy")
         self.description = f"Bild {date_string}"
 
@@ -84,6 +109,22 @@ class MainWindow(QMainWindow):
         self._take_picture_action.setToolTip("Take Picture")
         tool_bar.addAction(self._take_picture_action)
 
+        self.button_strip = QAction("Strip", self)
+        self.button_strip.triggered.connect(self.onPhotoStrip)
+        if config.CAPTURE_MODE in ("dual", "zsl"):
+            self.button_strip.setToolTip(f"Take a strip of {config.STRIP_SHOTS} pictures")
+        else:
+            self.button_strip.setToolTip("Strips need THERMAL_CAPTURE_MODE dual or zsl")
+        self.button_strip.setEnabled(False)
+        tool_bar.addAction(self.button_strip)
+
+        self.button_thermal = QAction("Thermal", self, checkable=True)
+        self.button_thermal.setChecked(config.THERMAL_VIEWFINDER)
+        self.button_thermal.toggled.connect(self.onThermalViewfinder)
+        self.button_thermal.setToolTip("Show the viewfinder as it will print")
+        self.button_thermal.setEnabled(False)
+        tool_bar.addAction(self.button_thermal)
+
         self.button_edit = QAction(QIcon("write.png"), "D", self)
         self.button_edit.triggered.connect(self.onEditDescription)
         self.button_edit.setToolTip("Write Image Heading")
@@ -99,82 +140,290 @@ class MainWindow(QMainWindow):
         self.button_print.setToolTip("Print Image")
         tool_bar.addAction(self.button_print)
 
+        self.button_gallery = QAction("Gallery", self)
+        self.button_gallery.triggered.connect(self.onGallery)
+        self.button_gallery.setToolTip("Reprint an earlier picture")
+        tool_bar.addAction(self.button_gallery)
+
         self.button_reset = QAction(QIcon("reset.png"), "P", self)
         self.button_reset.triggered.connect(self.onAbandonPhoto)
         self.button_reset.setToolTip("reset to camera")
         tool_bar.addAction(self.button_reset)
 
+        # not on the toolbar, only reachable through its shortcut
+        self.timing_summary = QAction("Timing summary", self, shortcut="Ctrl+I")
+        self.timing_summary.triggered.connect(self.onTimingSummary)
+        self.addAction(self.timing_summary)
+
         self.finish = QAction(QIcon("close.png"), "Q", self)
         self.finish.triggered.connect(self.closeEvent)
         tool_bar.addAction(self.finish)
 
-        available_cameras = QCameraInfo.availableCameras()
-        if available_cameras:
-            self._camera_info = available_cameras[0]
-            self._camera = QCamera(self._camera_info)
+        self.setWindowTitle("Thermal Printer")
+        self._take_picture_action.setEnabled(False)
+        self.setCentralWidget(QLabel("Camera starting ...", alignment=Qt.AlignCenter))
+        self.show_status_message("Camera starting ...")
+        self.first_frame.connect(self.on_first_frame)
+        self._camera_starter = CameraStarter(self.preview_configuration, camera_factory, self)
+        self._camera_starter.ready.connect(self.camera_ready)
+        self._camera_starter.failed.connect(self.camera_failed)
+        self._camera_starter.start()
+        journal = os.path.join(config.SPOOL_DIR, "journal.jsonl") if config.SPOOL_DIR else ""
+        if config.API_PORT or config.API_SOCKET:
+            QTimer.singleShot(0, self.start_api)
+        elif journal and os.path.exists(journal) and os.path.getsize(journal):
+            # jobs of the last session may be waiting to be printed again
+            QTimer.singleShot(0, lambda: self.print_queue)
+
+    def camera_ready(self, picam2):
+        if self._preview_factory is None:
+            from picamera2.previews.qt import QGlPicamera2
+
+            self._preview_factory = QGlPicamera2
+        self.picam2 = picam2
+        self.qpicamera2 = self._preview_factory(
+            self.picam2, width=350, height=300, keep_ar=False
+        )
+        self.qpicamera2.done_signal.connect(self.capture_done)
+        # the thermal viewfinder is stacked on top of the preview when enabled
+        self._viewfinder_stack = QStackedWidget()
+        self._viewfinder_stack.addWidget(self.qpicamera2)
+        self.setCentralWidget(self._viewfinder_stack)
+        name = self.picam2.camera_properties.get("Model", "camera")
+        self.setWindowTitle(f"Thermal Printer ({name})")
+        self.show_status_message(f"Starting: '{name}'")
+        self.picam2.start()
+        if config.CAPTURE_MODE == "zsl":
+            from zsl import ZslWorker
+
+            self._zsl = ZslWorker(self.picam2, config.ZSL_BUFFER_BYTES, self)
+            self._zsl.start()
+        self._take_picture_action.setEnabled(True)
+        # in switch mode the running stream is only preview sized
+        self.button_strip.setEnabled(config.CAPTURE_MODE in ("dual", "zsl"))
+        self.button_thermal.setEnabled(True)
+        if self.button_thermal.isChecked():
+            self.onThermalViewfinder(True)
+        self.picam2.capture_metadata(
+            wait=False, signal_function=lambda job: self.first_frame.emit()
+        )
 
-            self.picam2 = Picamera2()
-            self.picam2.configure(
-                self.picam2.create_preview_configuration({"size": (350, 300)})
+    def camera_failed(self, error):
+        print(f"camera unavailable: {error}", file=sys.stderr)
+        self.centralWidget().setText("Camera unavailable")
+        self.show_status_message("Camera unavailable")
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        if self.time_to_window is None:
+            self.time_to_window = time.monotonic() - STARTED
+            print(f"startup: window after {self.time_to_window * 1000:.0f} ms")
+
+    def on_first_frame(self):
+        if self.time_to_first_frame is None:
+            self.time_to_first_frame = time.monotonic() - STARTED
+            report = (
+                f"startup: window after {(self.time_to_window or 0) * 1000:.0f} ms,"
+                f" first frame after {self.time_to_first_frame * 1000:.0f} ms"
             )
-            self.qpicamera2 = QGlPicamera2(
-                self.picam2, width=350, height=300, keep_ar=False
+            print(report)
+            self.show_status_message(report)
+
+    @property
+    def print_queue(self):
+        if self._print_queue is None:
+            from print_queue import PrintQueue
+
+            self._print_queue = PrintQueue(self._print_backend, parent=self)
+            self._print_queue.job_changed.connect(self.on_print_job_changed)
+            journal = self._print_queue.journal
+            if journal is not None and journal.unfinished:
+                self.show_status_message(
+                    f"{len(journal.unfinished)} print jobs of the last session are printed again"
+                )
+        return self._print_queue
+
+    def preview_configuration(self, picam2=None):
+        picam2 = picam2 or self.picam2
+        if config.CAPTURE_MODE in ("dual", "zsl"):
+            # the viewfinder shows the lores stream, the shutter grabs main
+            return picam2.create_preview_configuration(
+                main={"size": config.CAPTURE_SIZE, "format": "RGB888"},
+                lores={"size": config.PREVIEW_SIZE},
+                display="lores",
             )
-            self.qpicamera2.done_signal.connect(self.capture_done)
-        
-            self.setCentralWidget(self.qpicamera2)
-
-        if self._camera and self._camera.error() != QCamera.Error:
-            name = self._camera_info.description()
-            self.setWindowTitle(f"Thermal Printer ({name})")
-            self.show_status_message(f"Starting: '{name}'")
-            self._take_picture_action.setEnabled(True)
-            self.picam2.start()
-        else:
-            self.setWindowTitle("Thermal Printer")
-            self._take_picture_action.setEnabled(False)
-            self.show_status_message("Camera unavailable")
+        # the lores stream feeds the thermal viewfinder
+        return picam2.create_preview_configuration(
+            {"size": config.PREVIEW_SIZE}, lores={"size": config.PREVIEW_SIZE}
+        )
 
     def show_status_message(self, message):
         self.statusBar().showMessage(message, 5000)
 
+    def start_api(self):
+        from api import PrintServer
+
+        try:
+            self._api = PrintServer(self.print_queue, config.API_PORT, config.API_SOCKET).start()
+        except OSError as error:
+            print(f"print API unavailable: {error}", file=sys.stderr)
+            self.show_status_message(f"Print API unavailable: {error}")
+
+    def onThermalViewfinder(self, checked):
+        if self.picam2 is None:
+            return
+        if not checked:
+            if self._viewfinder is not None:
+                self._viewfinder.stop()
+            self._viewfinder_stack.setCurrentWidget(self.qpicamera2)
+            return
+        if self._viewfinder is None:
+            from viewfinder import ThermalViewfinder
+
+            self._viewfinder = ThermalViewfinder()
+            self._viewfinder.report.connect(print)
+            self._viewfinder.report.connect(self.show_status_message)
+            self._viewfinder_stack.addWidget(self._viewfinder)
+        self._viewfinder_stack.setCurrentWidget(self._viewfinder)
+        self._viewfinder.start(self.picam2)
+
     def closeEvent(self, event):
+        if self._api is not None:
+            self._api.stop()
+            self._api = None
+        if self._viewfinder is not None:
+            self._viewfinder.stop()
+        if self._strip_worker is not None:
+            self._strip_worker.requestInterruption()
+            self._strip_worker.wait(1000)
+        if self._zsl is not None:
+            self._zsl.requestInterruption()
+            self._zsl.wait(1000)
+        if self._print_queue is not None:
+            self._print_queue.stop(timeout=1)
+        if self._archive is not None:
+            self._archive.flush()
+        if self._session is not None:
+            self._session.close()
+            self._session = None
         if self.picam2:
             self.picam2.stop()
         self.close()
 
-    def next_image_file_name(self):
-        datestr = QDate.currentDate().toString("dd_MM_yyyy")
-        timestr = QTime().currentTime().toString("hh_mm")
-        picname = f"{datestr}_{timestr}_image"
-        self._file_name = f"/home/lilli/Desktop/{picname}.jpg"
-        return self._file_name
+    @property
+    def session(self):
+        if self._session is None:
+            from session import SessionStore
+
+            self._session = SessionStore(config.SESSION_DIR)
+        return self._session
 
     def countdown(self):
         if self.counter > 0:
             self.show_status_message(str(self.counter))
             self.counter -= 1
-            QTimer.singleShot(500, self.countdown)
+            QTimer.singleShot(config.COUNTDOWN_STEP_MS, self.countdown)
         elif self.counter == 0:
             self.show_status_message("GO!")
             self.counter -= 1
-            QTimer.singleShot(500, self.countdown)
+            QTimer.singleShot(config.COUNTDOWN_STEP_MS, self.countdown)
         else:
-            cfg = self.picam2.create_still_configuration()
-            fileName = self.next_image_file_name()
-            self.picam2.switch_mode_and_capture_file(
-                cfg, fileName, wait=False, signal_function=self.qpicamera2.signal_done
-            )
+            self._shutter_pressed = time.monotonic()
+            self._countdown_span.end()
+            self._capture_span = timing.span("capture", mode=config.CAPTURE_MODE)
+            # in "zsl" mode the photo is already buffered, unless the ring is
+            # still empty right after the start
+            best = self._zsl.best() if self._zsl is not None else None
+            if best is not None:
+                self.use_sharpest(*best)
+            elif config.CAPTURE_MODE in ("dual", "zsl"):
+                self.picam2.capture_array(
+                    "main", wait=False, signal_function=self.qpicamera2.signal_done
+                )
+            else:
+                cfg = self.picam2.create_still_configuration(main={"format": "RGB888"})
+                self.picam2.switch_mode_and_capture_array(
+                    cfg, "main", wait=False, signal_function=self.qpicamera2.signal_done
+                )
             self.show_status_message("done making image")
             self.counter = 3
 
+    def use_sharpest(self, frame, score, age):
+        ring = self._zsl.ring
+        print(
+            f"zsl: sharpest of {ring.size} frames ({ring.nbytes // (1024 * 1024)} MB),"
+            f" {age * 1000:.0f} ms before the shutter, sharpness {score:.0f}"
+        )
+        self.set_frame(frame)
+        self.capture_done()
+
     def take_picture(self):
         self._take_picture_action.setEnabled(False)
+        self._countdown_span = timing.span("countdown")
         self.countdown()
 
-    def capture_done(self):
-        self.show_status_message("capture_done")
+    def onPhotoStrip(self):
+        from strip import StripWorker
+
+        self._take_picture_action.setEnabled(False)
+        self.button_strip.setEnabled(False)
+        self._strip_worker = StripWorker(
+            self.picam2, config.STRIP_SHOTS, config.STRIP_INTERVAL, parent=self
+        )
+        self._strip_worker.shot.connect(
+            lambda shot, shots: self.show_status_message(f"Strip {shot}/{shots}")
+        )
+        self._strip_worker.strip_ready.connect(self.strip_done)
+        self._strip_worker.failed.connect(self.strip_failed)
+        self._strip_worker.start()
+
+    def strip_done(self, strip):
+        self.set_frame(strip)
+        self._take_picture_action.setEnabled(True)
+        self.button_strip.setEnabled(True)
+        self.show_status_message("Strip done")
+        self.onPrintPhoto()
+
+    def strip_failed(self, error):
+        print(f"strip failed: {error}", file=sys.stderr)
+        self.show_status_message(f"Strip failed: {error}")
+        self._take_picture_action.setEnabled(True)
+        self.button_strip.setEnabled(True)
+
+    def capture_done(self, job=None):
+        if job is not None:
+            self.set_frame(self.picam2.wait(job))
+        self._capture_span.end()
+        message = "capture_done"
+        if self._shutter_pressed is not None:
+            lag = time.monotonic() - self._shutter_pressed
+            self._shutter_pressed = None
+            self.shutter_lags.append(lag)
+            mean = sum(self.shutter_lags) / len(self.shutter_lags)
+            print(
+                f"shutter lag ({config.CAPTURE_MODE}): {lag * 1000:.0f} ms,"
+                f" mean {mean * 1000:.0f} ms"
+            )
+            message += f" in {lag * 1000:.0f} ms"
+        self.show_status_message(message)
         self._take_picture_action.setEnabled(True)
+        if self._frame is not None:
+            self.prepare_print()
+
+    def set_frame(self, frame):
+        self.cancel_prepared_print()
+        self._frame = frame
+        self._print_frame = None
+        self._photo_id = None
+        if config.ARCHIVE_CAPTURES:
+            if self._archive is None:
+                from frames import ArchiveWriter
+
+                self._archive = ArchiveWriter()
+            photo = self.session.add(frame, self.description)
+            self._photo_id = photo.id
+            self._file_name = photo.file
+            self._archive.write(frame, photo.file)
 
     def _capture_error(self, id, error, error_string):
         print(error_string, file=sys.stderr)
@@ -184,53 +433,143 @@ class MainWindow(QMainWindow):
         print(error_string, file=sys.stderr)
         self.show_status_message(error_string)
 
-    def print_description_func(self):
-        description_loc = "/home/lilli/Desktop/description.txt"
-        if os.path.isfile(description_loc):
-            os.system(f"cat {description_loc} | lp")
-            self.show_status_message("Printing Description ...")
-        else:
-            self.show_status_message("Description not found")
-
-    def print_image_func(self):
-        fn = self._file_name
-        if os.path.isfile(fn):
-            print("printing image", fn)
-            os.system(f"lp -o landscape -o fit-to-page {fn}")
-            self.show_status_message(f"Printing Image {fn} ...")
-        else:
-            self.show_status_message("Image not found")
-        QTimer.singleShot(1000, self.print_description_func)
+    def on_print_job_changed(self, job_id, state, detail):
+        message = f"Print job {job_id}: {state}"
+        if detail:
+            message += f" ({detail})"
+        print(message)
+        self.show_status_message(message)
+
+    def _print_job(self):
+        """A job for the current photo and description, None without a photo."""
+        from print_queue import PrintJob
+
+        if self._frame is not None:
+            frame = self._frame if self._print_frame is None else self._print_frame
+            return PrintJob(image=frame, text=self.description, order="BGR")
+        if os.path.isfile(self._file_name):
+            return PrintJob(image=self._file_name, text=self.description)
+        return None
+
+    def prepare_print(self):
+        """Render the current photo for printing ahead of the print button."""
+        self._prepared_job = self._print_job()
+        if self._prepared_job is not None:
+            self.print_queue.prepare(self._prepared_job)
+
+    def cancel_prepared_print(self):
+        self._prepared_job = None
+        if self._print_queue is not None:
+            self._print_queue.cancel_preparation()
 
     def onPrintPhoto(self):
-        self.show_status_message("printing...")
-        QTimer.singleShot(1000, self.print_image_func)
+        job = self._prepared_job
+        frame = self._frame if self._print_frame is None else self._print_frame
+        # the prepared job is only good while neither photo nor text changed
+        if job is None or job.image is not frame or job.text != self.description:
+            job = self._print_job()
+        self._prepared_job = None
+        if job is None:
+            self.show_status_message("Image not found")
+            return
+        self.print_queue.submit(job)
+        if self._frame is not None and self._photo_id is not None:
+            self.session.record_print(self._photo_id, self.description)
+
+    def onGallery(self):
+        from gallery import GalleryDialog
+
+        gallery = GalleryDialog(self.session, self)
+        gallery.reprint.connect(lambda photo_id: self.reprint(photo_id, gallery))
+        available_geometry = self.screen().availableGeometry()
+        gallery.resize(available_geometry.width(), available_geometry.height() - 40)
+        gallery.exec()
+        gallery.deleteLater()
+
+    def reprint(self, photo_id, gallery=None):
+        from print_queue import PrintJob
+
+        photo = self.session.get(photo_id)
+        if photo is None or not os.path.isfile(photo.file):
+            # the archive may still be writing a photo taken a moment ago
+            if self._archive is not None:
+                self._archive.flush()
+            if photo is None or not os.path.isfile(photo.file):
+                self.show_status_message("Image not found")
+                return
+        self.print_queue.submit(PrintJob(image=photo.file, text=photo.description))
+        self.session.record_print(photo_id)
+        if gallery is not None:
+            gallery.set_printed(photo_id, photo.printed + 1)
+
+    def onTimingSummary(self):
+        lines = []
+        if self._print_queue is not None:
+            lines.append(self._print_queue.format_stats())
+            if self._print_queue.cache is not None:
+                lines.append(self._print_queue.cache.format_stats())
+        if timing.ENABLED:
+            lines.append(timing.format_summary(timing.summary(timing.read())))
+        else:
+            lines.append("Timing log disabled (THERMAL_TIMING_LOG)")
+        print("\n".join(lines))
+        self.statusBar().showMessage(" | ".join(lines).replace("\n", " | "), 15000)
 
     def onAbandonPhoto(self):
-        preview_config = self.picam2.create_preview_configuration()
-        self.picam2.switch_mode(preview_config)
+        self.cancel_prepared_print()
+        self._frame = None
+        self._print_frame = None
+        if self.picam2 and config.CAPTURE_MODE == "switch":
+            span = timing.span("mode_switch")
+            self.picam2.switch_mode(
+                self.preview_configuration(), wait=False, signal_function=lambda job: span.end()
+            )
         print("back to camera!")
 
     def onDrawImage(self):
-        if self._file_name == "":
-            fn = self.next_image_file_name()
+        import printing
+        from drawing import Drawing
+        from frames import array_to_qimage, qimage_to_array
+
+        if self._frame is None:
+            base = None
             img = QImage(self.size(), QImage.Format.Format_Grayscale8)
             img.fill(Qt.white)
-            drawing_view = Drawing(fn, img)
             self.show_status_message("Draw new Image")
         else:
-            img = QImage()
-            img.load(self._file_name)
-            drawing_view = Drawing(self._file_name, img)
+            # wraps the captured frame without a copy, "clear" returns to it
+            base = array_to_qimage(self._frame)
+            # a deep copy, so cancelling leaves the captured frame untouched
+            img = base.convertToFormat(QImage.Format.Format_RGB32)
             self.show_status_message("Draw on Image")
+        drawing_view = Drawing("", img, base)
         if drawing_view.exec():
+            self.set_frame(qimage_to_array(drawing_view.image))
+            self._print_frame = qimage_to_array(
+                drawing_view.renderForPrint(printing.PRINTER_DOTS)
+            )
+            self.prepare_print()
             print("Success!")
         else:
             print("Cancel!")
+        # the canvas, its undo tiles and buttons go now, not whenever the
+        # garbage collector gets to the wrapper
+        drawing_view.deleteLater()
 
     def onEditDescription(self):
-        ddialog = DescriptionDialog(self.description)
+        # the dialog and its keyboard are built once and reused
+        if self._description_dialog is None:
+            from keyboard import DescriptionDialog
+
+            self._description_dialog = DescriptionDialog(self.description, self)
+        else:
+            self._description_dialog.set_description(self.description)
+        ddialog = self._description_dialog
         if ddialog.exec():
+            changed = ddialog.description != self.description
+            self.description = ddialog.description
+            if changed and self._frame is not None:
+                self.prepare_print()
             print("Success!")
         else:
             print("Cancel!")
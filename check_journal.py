@@ -0,0 +1,127 @@
+"""Kill the printing process at random points and check the spool journal.
+
+    python check_journal.py [rounds]
+
+Each round starts a child process that submits a few jobs to a PrintQueue
+with a spool journal and fake_lp.py as CUPS, and kills it with SIGKILL
+after a random delay: while importing, submitting, rendering, inside lp or
+while writing the journal.  The next child replays what the last one left
+unfinished.  A final child submits nothing and runs until the queue is
+empty.  Then every job the children saw reach the disk must have been
+printed exactly once, nothing may have been printed twice and the spool
+must be empty.  fake_lp prints a held job only once it is released, like
+CUPS; submissions a kill left held are counted separately.
+"""
+
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+from journal import Journal
+
+# seconds fake_lp takes per call, so kills also land inside lp
+LP_DELAY = "0.03"
+
+
+def child(workdir, jobs):
+    from bench_printing import synthetic_frame
+    from fakes import fake_cups_backend
+    from print_queue import PrintJob, PrintQueue
+
+    journal = Journal(os.path.join(workdir, "spool"))
+    with open(os.path.join(workdir, "replayed"), "a") as file:
+        file.write(f"{len(journal.unfinished)}\n")
+    backend = fake_cups_backend(os.path.join(workdir, "lp.jsonl"))
+    print_queue = PrintQueue(backend, cache=None, journal=journal, retry_delay=0.05)
+    frame = synthetic_frame(320, 240)
+    with open(os.path.join(workdir, "acked"), "a") as acked:
+        for i in range(jobs):
+            image = frame if i % 3 == 0 else None
+            job = print_queue.submit(PrintJob(image=image, text=uuid.uuid4().hex, order="BGR"))
+            journal.wait(job.journal_seq)
+            # from here on the job must be printed, whenever the kill comes
+            acked.write(job.spool_id + "\n")
+            acked.flush()
+    while any(printer.load for printer in print_queue.printers):
+        time.sleep(0.01)
+    print_queue.stop()
+
+
+def spawn(workdir, jobs):
+    env = dict(os.environ, FAKE_LP_DELAY=LP_DELAY, QT_QPA_PLATFORM="offscreen")
+    return subprocess.Popen([sys.executable, __file__, "--child", workdir, str(jobs)], env=env)
+
+
+def read_lines(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as file:
+        return [line for line in file.read().splitlines() if line]
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    workdir = tempfile.mkdtemp(prefix="check-journal-")
+    rng = random.Random(int(os.environ.get("SEED", "1")))
+    killed = 0
+    for _ in range(rounds):
+        process = spawn(workdir, rng.randint(1, 6))
+        try:
+            process.wait(rng.uniform(0.3, 2.0))
+        except subprocess.TimeoutExpired:
+            process.send_signal(signal.SIGKILL)
+            process.wait()
+            killed += 1
+    final = spawn(workdir, 0)
+    if final.wait(120) != 0:
+        print("the final run did not finish cleanly")
+        return 1
+
+    records = [json.loads(line) for line in read_lines(os.path.join(workdir, "lp.jsonl"))]
+    released = {record["resume"] for record in records if "resume" in record}
+    printed = {}
+    left_held = 0
+    for record in records:
+        if "resume" in record:
+            continue
+        if record.get("held") and record["id"] not in released:
+            left_held += 1
+        else:
+            printed[record["title"]] = printed.get(record["title"], 0) + 1
+    acked = set(read_lines(os.path.join(workdir, "acked")))
+    lost = acked - set(printed)
+    twice = [title for title, count in printed.items() if count > 1]
+    journal = Journal(os.path.join(workdir, "spool"))
+    unfinished = len(journal.unfinished)
+    journal.close()
+    left = sorted(os.listdir(os.path.join(workdir, "spool")))
+    replayed = sum(int(n) for n in read_lines(os.path.join(workdir, "replayed")))
+
+    print(f"{rounds} runs, {killed} killed, {len(acked)} jobs on disk before the kill,"
+          f" {len(printed)} printed")
+    print(f"{replayed} jobs replayed, {left_held} submissions left held by a kill")
+    ok = True
+    if lost:
+        print(f"LOST: {len(lost)} jobs, e.g. {sorted(lost)[:3]}")
+        ok = False
+    if twice:
+        print(f"PRINTED TWICE: {len(twice)} jobs, e.g. {twice[:3]}")
+        ok = False
+    if unfinished or left != ["journal.jsonl"]:
+        print(f"spool not empty: {unfinished} unfinished jobs, files {left[:5]}")
+        ok = False
+    print("ok" if ok else "FAILED", f"({workdir})")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--child"]:
+        child(sys.argv[2], int(sys.argv[3]))
+    else:
+        sys.exit(main())
@@ -0,0 +1,220 @@
+"""Soak test: thousands of booth cycles through MainWindow, watching memory.
+
+    QT_QPA_PLATFORM=offscreen python check_soak.py [--cycles N] [--every K]
+
+Each cycle captures a photo with FakePicamera2 (countdown shortened to
+0 ms), edits the description, draws a stroke on the photo, prints it
+through the print queue to an in-process stand-in printer and abandons the
+photo; every 25th cycle also opens and closes the gallery.  Captures are
+archived, journaled and cached in a scratch directory like on the booth.
+
+Every K cycles the Python heap (tracemalloc), the resident set size and
+the number of Qt widgets and child objects of the window are sampled.  The
+report shows their growth per cycle, fitted over the samples after the
+first fifth of the run, and the code that allocated the most between the
+first and the last sample.  The exit status is 1 if any growth is above
+its threshold.
+"""
+
+import argparse
+import gc
+import math
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+from PyQt5.QtCore import QEvent, QEventLoop, QObject, QPoint, Qt, QTimer
+from PyQt5.QtWidgets import QApplication
+
+import config
+from bench_drawing import mouse
+
+
+class CountingBackend:
+    name = "soak"
+
+    def __init__(self):
+        self.printed = 0
+
+    def send(self, job, bands):
+        for _ in bands:
+            pass
+        return []
+
+    def wait(self, handle):
+        self.printed += 1
+
+
+def wait_for(app, predicate, timeout=30):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise TimeoutError("soak step did not finish")
+        app.processEvents(QEventLoop.AllEvents, 5)
+
+
+def answer_dialog(app, answer):
+    """Run `answer` on the modal dialog the next call opens."""
+
+    def run():
+        dialog = app.activeModalWidget()
+        if dialog is None:
+            # not shown yet
+            QTimer.singleShot(1, run)
+            return
+        answer(dialog)
+
+    QTimer.singleShot(0, run)
+
+
+def draw_stroke(app, drawing, cycle):
+    y = 40 + cycle % 100
+    app.sendEvent(drawing, mouse(QEvent.MouseButtonPress, QPoint(20, y)))
+    for x in range(20, 200, 10):
+        app.sendEvent(drawing, mouse(QEvent.MouseMove, QPoint(x, y + x // 10)))
+    app.sendEvent(drawing, mouse(QEvent.MouseButtonRelease, QPoint(200, y), Qt.NoButton))
+    drawing.save()
+
+
+def describe(dialog, cycle):
+    dialog.set_description(f"Soak cycle {cycle}")
+    dialog.accept(None)
+
+
+def cycle(app, window, backend, n):
+    window.take_picture()
+    wait_for(app, lambda: window._take_picture_action.isEnabled() and window._frame is not None)
+    answer_dialog(app, lambda dialog: describe(dialog, n))
+    window.onEditDescription()
+    answer_dialog(app, lambda dialog: draw_stroke(app, dialog, n))
+    window.onDrawImage()
+    printed = backend.printed
+    window.onPrintPhoto()
+    wait_for(app, lambda: backend.printed > printed)
+    if n % 25 == 0:
+        answer_dialog(app, lambda dialog: dialog.reject())
+        window.onGallery()
+    window.onAbandonPhoto()
+
+
+def rss_bytes():
+    with open("/proc/self/statm") as file:
+        return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def sample(app, window, n):
+    # deleteLater and cyclic garbage are collected before counting
+    app.sendPostedEvents(None, QEvent.DeferredDelete)
+    app.processEvents()
+    gc.collect()
+    return {
+        "cycle": n,
+        "python": tracemalloc.get_traced_memory()[0],
+        "rss": rss_bytes(),
+        "widgets": len(app.allWidgets()),
+        "objects": len(window.findChildren(QObject)),
+    }
+
+
+def slope(samples, key):
+    x = np.array([s["cycle"] for s in samples], dtype=float)
+    y = np.array([s[key] for s in samples], dtype=float)
+    return float(np.polyfit(x, y, 1)[0]) if len(samples) > 1 else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cycles", type=int, default=2000)
+    parser.add_argument("--every", type=int, default=50, help="cycles between samples")
+    parser.add_argument("--size", default="640x480", help="capture size")
+    parser.add_argument("--mode", default="dual", choices=("switch", "dual", "zsl"))
+    parser.add_argument("--max-python-kb", type=float, default=2.0,
+                        help="allowed Python heap growth per cycle")
+    parser.add_argument("--max-rss-kb", type=float, default=16.0,
+                        help="allowed resident set growth per cycle")
+    parser.add_argument("--max-widgets", type=float, default=0.01,
+                        help="allowed Qt widgets/objects growth per cycle")
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp(prefix="soak-")
+    config.CAPTURE_MODE = args.mode
+    config.CAPTURE_SIZE = tuple(int(v) for v in args.size.split("x"))
+    config.COUNTDOWN_STEP_MS = 0
+    config.SESSION_DIR = os.path.join(scratch, "session")
+    config.SPOOL_DIR = os.path.join(scratch, "spool")
+    config.RASTER_CACHE_DIR = os.path.join(scratch, "rasters")
+    config.TIMING_LOG = ""
+    os.makedirs(config.SESSION_DIR)
+    # the description dialog saves to the desktop
+    os.environ["HOME"] = scratch
+    os.makedirs(os.path.join(scratch, "Desktop"))
+
+    import camera
+    from fakes import FakePicamera2, FakeQGlPicamera2
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    backend = CountingBackend()
+    window = camera.MainWindow(
+        camera_factory=lambda: FakePicamera2(frame_period=0.001, switch_delay=0),
+        preview_factory=FakeQGlPicamera2,
+        print_backend=backend,
+    )
+    window.show()
+    wait_for(app, lambda: window.time_to_first_frame is not None)
+
+    tracemalloc.start()
+    warmup = max(args.every, args.cycles // 5)
+    samples = []
+    first = None
+    start = time.monotonic()
+    for n in range(1, args.cycles + 1):
+        cycle(app, window, backend, n)
+        if n % args.every == 0:
+            samples.append(sample(app, window, n))
+            if n == warmup or first is None and n > warmup:
+                first = tracemalloc.take_snapshot()
+            s = samples[-1]
+            print(f"cycle {n}: python {s['python'] / 1e6:.1f} MB, rss {s['rss'] / 1e6:.1f} MB,"
+                  f" {s['widgets']} widgets, {s['objects']} objects"
+                  f" ({(time.monotonic() - start) / n * 1000:.0f} ms/cycle)", flush=True)
+    last = tracemalloc.take_snapshot()
+    window.close()
+
+    steady = [s for s in samples if s["cycle"] >= warmup]
+    growth = {
+        "python": slope(steady, "python") / 1024,
+        "rss": slope(steady, "rss") / 1024,
+        "widgets": slope(steady, "widgets"),
+        "objects": slope(steady, "objects"),
+    }
+    limits = {
+        "python": args.max_python_kb,
+        "rss": args.max_rss_kb,
+        "widgets": args.max_widgets,
+        "objects": args.max_widgets,
+    }
+    units = {"python": "KB", "rss": "KB", "widgets": "", "objects": ""}
+    print(f"\ngrowth per cycle over cycles {warmup}-{args.cycles}:")
+    failed = False
+    for key, value in growth.items():
+        over = value > limits[key]
+        failed |= over
+        print(f"  {key:8s} {value:+8.3f} {units[key]:2s} (limit {limits[key]})"
+              + ("  OVER" if over else ""))
+    if first is not None:
+        print("\nlargest Python heap growth since the warm-up:")
+        for stat in last.compare_to(first, "lineno")[:8]:
+            if stat.size_diff > 0:
+                frame = stat.traceback[0]
+                per_cycle = stat.size_diff / max(1, args.cycles - warmup)
+                print(f"  {stat.size_diff / 1024:+9.1f} KB ({per_cycle:+.0f} B/cycle)"
+                      f" {os.path.basename(frame.filename)}:{frame.lineno}")
+    print("\nFAILED" if failed else "\nok", f"({scratch})")
+    return 1 if failed or math.isnan(sum(growth.values())) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+"""Booth settings, each one can be overridden with an environment variable."""
+
+import os
+
+# character device of a directly attached ESC/POS printer (e.g. /dev/serial0
+# or /dev/usb/lp0), leave empty to print through CUPS
+PRINTER_DEVICE = os.environ.get("THERMAL_PRINTER_DEVICE", "")
+PRINTER_BAUDRATE = int(os.environ.get("THERMAL_PRINTER_BAUDRATE", "19200"))
+# "none" paces writes by time, "rtscts" and "xonxoff" let the printer throttle us
+PRINTER_FLOW_CONTROL = os.environ.get("THERMAL_PRINTER_FLOW_CONTROL", "none")
+# seconds the print head needs per dot row and the motor per fed dot row,
+# the defaults are the conservative values of the Adafruit thermal library
+PRINTER_DOT_PRINT_TIME = float(os.environ.get("THERMAL_PRINTER_DOT_PRINT_TIME", "0.03"))
+PRINTER_DOT_FEED_TIME = float(os.environ.get("THERMAL_PRINTER_DOT_FEED_TIME", "0.0021"))
+# also skip the blank left margin of each band, for printers that support GS L
+PRINTER_TRIM_LEFT = os.environ.get("THERMAL_PRINTER_TRIM_LEFT", "0") == "1"
+# images with more pixels or that would print longer than this many dot rows
+# (8 per mm, 8000 is a meter of paper) are refused before they are decoded
+MAX_IMAGE_PIXELS = int(os.environ.get("THERMAL_MAX_IMAGE_PIXELS", "50000000"))
+MAX_PRINT_ROWS = int(os.environ.get("THERMAL_MAX_PRINT_ROWS", "8000"))
+
+# commands used to talk to CUPS, replaceable by stand-ins for testing
+LP_COMMAND = os.environ.get("THERMAL_LP", "lp")
+LPSTAT_COMMAND = os.environ.get("THERMAL_LPSTAT", "lpstat")
+
+# write every capture and drawing to disk as a JPEG, in the background
+ARCHIVE_CAPTURES = os.environ.get("THERMAL_ARCHIVE_CAPTURES", "1") == "1"
+
+# "switch" reconfigures the sensor for a full resolution still on every shot,
+# "dual" configures a preview and a print resolution stream once and grabs
+# the still from the running camera without a mode switch, "zsl" streams
+# like "dual" and takes the sharpest of the last frames when the countdown ends
+CAPTURE_MODE = os.environ.get("THERMAL_CAPTURE_MODE", "switch")
+CAPTURE_SIZE = tuple(
+    int(v) for v in os.environ.get("THERMAL_CAPTURE_SIZE", "1640x1232").split("x")
+)
+# bytes of frames the "zsl" ring buffer keeps (at least one frame), 32 MB are
+# five frames of 1640x1232
+ZSL_BUFFER_BYTES = int(os.environ.get("THERMAL_ZSL_BUFFER_BYTES", str(32 * 1024 * 1024)))
+PREVIEW_SIZE = (350, 300)
+
+# milliseconds per step of the "3, 2, 1, GO!" countdown before a capture
+COUNTDOWN_STEP_MS = int(os.environ.get("THERMAL_COUNTDOWN_STEP_MS", "500"))
+
+# bytes of pixel tiles the drawing undo history may keep
+DRAWING_HISTORY_BUDGET = int(os.environ.get("THERMAL_DRAWING_HISTORY_BUDGET", str(16 * 1024 * 1024)))
+
+# characters per printed line of the description (32 for Font A, 42 for Font B)
+CAPTION_COLUMNS = int(os.environ.get("THERMAL_CAPTION_COLUMNS", "32"))
+
+# JSONL file for per-stage timing spans, empty disables them
+TIMING_LOG = os.environ.get("THERMAL_TIMING_LOG", "")
+TIMING_LOG_BYTES = int(os.environ.get("THERMAL_TIMING_LOG_BYTES", str(1024 * 1024)))
+
+# photo strip: number of frames and seconds between them, strips are grabbed
+# from the print resolution stream of the "dual" and "zsl" capture modes
+STRIP_SHOTS = int(os.environ.get("THERMAL_STRIP_SHOTS", "4"))
+STRIP_INTERVAL = float(os.environ.get("THERMAL_STRIP_INTERVAL", "3"))
+
+# captures, drawings and the session index (session.sqlite) are kept here
+SESSION_DIR = os.environ.get("THERMAL_SESSION_DIR", os.path.expanduser("~/Desktop"))
+
+# print-ready rasters are cached here by content and settings, empty disables it
+RASTER_CACHE_DIR = os.environ.get(
+    "THERMAL_RASTER_CACHE_DIR", os.path.expanduser("~/.cache/thermalprinter/rasters")
+)
+RASTER_CACHE_BYTES = int(os.environ.get("THERMAL_RASTER_CACHE_BYTES", str(64 * 1024 * 1024)))
+RASTER_CACHE_ITEMS = int(os.environ.get("THERMAL_RASTER_CACHE_ITEMS", "8"))
+
+# print jobs are journaled here until printed and replayed after a crash,
+# empty disables it
+SPOOL_DIR = os.environ.get(
+    "THERMAL_SPOOL_DIR", os.path.expanduser("~/.cache/thermalprinter/spool")
+)
+
+# start with the viewfinder in the printer's dithered black-and-white look
+THERMAL_VIEWFINDER = os.environ.get("THERMAL_VIEWFINDER", "0") == "1"
+
+# comma separated pool of printers: CUPS destinations or device paths (a
+# leading "/" prints directly via ESC/POS), empty uses the single printer above
+PRINTERS = os.environ.get("THERMAL_PRINTERS", "")
+
+# local print API (api.py): TCP port on localhost and/or a Unix socket path,
+# both empty disable it; more waiting jobs than API_MAX_PENDING are refused
+API_PORT = int(os.environ.get("THERMAL_API_PORT", "0")) or None
+API_SOCKET = os.environ.get("THERMAL_API_SOCKET", "")
+API_MAX_PENDING = int(os.environ.get("THERMAL_API_MAX_PENDING", "16"))
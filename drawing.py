@@ -4,10 +4,13 @@ from PyQt5.QtGui import *
 from PyQt5.QtCore import *
 import sys
 
+import config
+from strokes import StrokeHistory
+
 
 # window class
 class Drawing(QDialog):
-    def __init__(self, file_path: str, image: QImage):
+    def __init__(self, file_path: str, image: QImage, base: QImage = None):
         super().__init__()
         self.file_path = file_path
         # setting title
@@ -19,6 +22,9 @@ class Drawing(QDialog):
         self.image = image
         self.resize(image.size())
 
+        # strokes with undo/redo, "clear" goes back to the base image
+        self.history = StrokeHistory(image, base, config.DRAWING_HISTORY_BUDGET)
+
         # variables
         # drawing flag
         self.drawing = False
@@ -30,6 +36,16 @@ class Drawing(QDialog):
         # QPoint object to tract the point
         self.lastPoint = QPoint()
 
+        # move events collected since the last frame, drawn as one polyline
+        self.pendingPoints = []
+        self.flushTimer = QTimer(self)
+        self.flushTimer.setSingleShot(True)
+        self.flushTimer.setInterval(16)
+        self.flushTimer.timeout.connect(self.flushStroke)
+
+        # the image scaled to the widget, only damaged parts are redrawn
+        self.display = QPixmap()
+
         # creating menu bar
         mainMenu = QHBoxLayout()
 
@@ -45,6 +61,15 @@ class Drawing(QDialog):
         # adding action to the clear
         clearAction.clicked.connect(self.clear)
 
+        # creating undo and redo actions
+        undoAction = QPushButton("Undo", self)
+        mainMenu.addWidget(undoAction)
+        undoAction.clicked.connect(self.undo)
+
+        redoAction = QPushButton("Redo", self)
+        mainMenu.addWidget(redoAction)
+        redoAction.clicked.connect(self.redo)
+
         # creating clear action
         cancelAction = QPushButton("Cancel", self)
         mainMenu.addWidget(cancelAction)
@@ -89,65 +114,136 @@ class Drawing(QDialog):
             self.drawing = True
             # make last point to the point of cursor
             self.lastPoint = event.pos()
+            toImage = self.imageTransform()
+            self.history.begin(
+                self.brushSize * self.imageScale(), self.brushColor,
+                toImage.map(QPointF(event.pos())),
+            )
 
     # method for tracking mouse activity
     def mouseMoveEvent(self, event):
         # checking if left button is pressed and drawing flag is true
         if (event.buttons() & Qt.LeftButton) & self.drawing:
-            # creating painter object
-            painter = QPainter(self.image)
-
-            # set the pen of the painter
-            painter.setPen(
-                QPen(
-                    self.brushColor,
-                    self.brushSize,
-                    Qt.SolidLine,
-                    Qt.RoundCap,
-                    Qt.RoundJoin,
-                )
-            )
-
-            # draw line from the last point of cursor to the current point
-            # this will draw only one step
-            painter.drawLine(self.lastPoint, event.pos())
-
-            # change the last point
-            self.lastPoint = event.pos()
-            # update
-            self.update()
+            # only collect the point, touch screens deliver far more move
+            # events than frames, they are painted together in flushStroke
+            self.pendingPoints.append(event.pos())
+            if not self.flushTimer.isActive():
+                self.flushTimer.start()
 
     # method for mouse left button release
     def mouseReleaseEvent(self, event):
-        if event.button() == Qt.LeftButton:
+        if event.button() == Qt.LeftButton and self.drawing:
+            self.flushStroke()
+            self.history.end()
             # make drawing flag false
             self.drawing = False
 
+    # the display stretches the image to the widget, so x and y scale apart
+    def imageTransform(self):
+        return QTransform.fromScale(
+            self.image.width() / max(1, self.width()),
+            self.image.height() / max(1, self.height()),
+        )
+
+    # the brush width in image pixels
+    def imageScale(self):
+        toImage = self.imageTransform()
+        return (toImage.m11() + toImage.m22()) / 2
+
+    def makePen(self, width):
+        return QPen(self.brushColor, width, Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin)
+
+    # draw the collected points onto the image and the display cache
+    def flushStroke(self):
+        self.flushTimer.stop()
+        if not self.pendingPoints:
+            return
+        points = [self.lastPoint] + self.pendingPoints
+        self.lastPoint = self.pendingPoints[-1]
+        self.pendingPoints = []
+
+        toImage = self.imageTransform()
+        self.history.paint_segment([toImage.map(QPointF(p)) for p in points[1:]])
+
+        polygon = QPolygon(points)
+        if not self.display.isNull():
+            painter = QPainter(self.display)
+            painter.setPen(self.makePen(self.brushSize))
+            painter.drawPolyline(polygon)
+            painter.end()
+
+        # repaint only the bounds of the new segment
+        margin = self.brushSize // 2 + 2
+        self.update(polygon.boundingRect().adjusted(-margin, -margin, margin, margin))
+
+    # rebuild the scaled display cache from the image, or only the part of
+    # it covering `rect` in image coordinates
+    def refreshDisplay(self, rect=None):
+        if rect is None or self.display.size() != self.size():
+            self.display = QPixmap.fromImage(
+                self.image.scaled(self.size(), Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+            )
+            return self.rect()
+        toImage = self.imageTransform()
+        target = toImage.inverted()[0].mapRect(QRectF(rect)).toAlignedRect()
+        painter = QPainter(self.display)
+        painter.setRenderHint(QPainter.SmoothPixmapTransform)
+        painter.drawImage(QRectF(target), self.image, toImage.mapRect(QRectF(target)))
+        painter.end()
+        return target
+
+    def resizeEvent(self, event):
+        self.refreshDisplay()
+        super().resizeEvent(event)
+
     # paint event
     def paintEvent(self, event):
+        if self.display.size() != self.size():
+            self.refreshDisplay()
         # create a canvas
         canvasPainter = QPainter(self)
 
-        # draw rectangle on the canvas
-        canvasPainter.drawImage(self.rect(), self.image, self.image.rect())
+        # copy only the damaged rectangle from the cached display
+        canvasPainter.drawPixmap(event.rect(), self.display, event.rect())
 
     # method for saving canvas
     def save(self):
-        print(self.file_path)
-        self.image.save(self.file_path)
-        self.close()
+        self.flushStroke()
+        if self.file_path:
+            print(self.file_path)
+            self.image.save(self.file_path)
+        self.accept()
 
     # method for saving canvas
     def cancel(self):
         self.close()
 
-    # method for clearing every thing on canvas
+    # method for clearing every stroke, the photo underneath stays
     def clear(self):
-        # make the whole canvas white
-        self.image.fill(Qt.white)
+        self.flushStroke()
+        self.history.reset()
+        self.refreshDisplay()
         # update
         self.update()
 
+    # methods for taking back and redoing strokes
+    def undo(self):
+        self.flushStroke()
+        rect = self.history.undo()
+        if rect is not None:
+            self.update(self.refreshDisplay(rect))
+
+    def redo(self):
+        rect = self.history.redo()
+        if rect is not None:
+            self.update(self.refreshDisplay(rect))
+
+    # render the drawing with its short side at the printer's dot width,
+    # replaying the stroke vectors instead of scaling the painted pixels
+    def renderForPrint(self, dots):
+        short = min(self.image.width(), self.image.height())
+        return self.history.render(dots / max(1, short))
+
     # methods for changing pixel sizes
     def Pixel_4(self):
         self.brushSize = 4
@@ -164,6 +260,8 @@ class Drawing(QDialog):
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
-    main_win = Drawing("test")
+    image = QImage(480, 320, QImage.Format.Format_RGB32)
+    image.fill(Qt.white)
+    main_win = Drawing("test.png", image)
     main_win.show()
     sys.exit(app.exec())
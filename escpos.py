@@ -0,0 +1,294 @@
+"""Direct ESC/POS backend that streams raster bands to the printer device.
+
+Bypasses the CUPS spooler and filter chain: bands of the dithered image are
+written to the serial/USB character device as soon as they are dithered, so
+the printer starts on the first dot row while the rest is still computed.
+Any writable path works as the device, which makes a pty or a plain file a
+usable stand-in printer.
+"""
+
+import os
+import select
+import stat
+import termios
+import time
+import tty
+
+import config
+import printing
+
+ESC = b"\x1b"
+GS = b"\x1d"
+DLE = b"\x10"
+EOT = b"\x04"
+INIT = ESC + b"@"
+# 8N1 serial framing costs ten bits per byte
+BITS_PER_BYTE = 10
+
+
+def raster_command(bits):
+    """Encode a boolean band as a `GS v 0` raster bit image command."""
+    rows = printing.pack_rows(bits)
+    height, width_bytes = rows.shape
+    header = GS + b"v0\x00" + bytes(
+        [width_bytes & 0xFF, width_bytes >> 8, height & 0xFF, height >> 8]
+    )
+    return header + rows.tobytes()
+
+
+def feed_dots_command(dots):
+    """`ESC J n`: feed the paper by `n` dot rows without printing, n <= 255."""
+    return ESC + b"J" + bytes([max(0, min(255, dots))])
+
+
+def left_margin_command(dots):
+    """`GS L nL nH`: start the following rows `dots` dots from the left edge."""
+    return GS + b"L" + bytes([dots & 0xFF, dots >> 8])
+
+
+def feed_command(lines):
+    """`ESC d n`: print the buffer and feed `lines` text lines."""
+    return ESC + b"d" + bytes([max(0, min(255, lines))])
+
+
+class PrintStats:
+    """Throughput of a single job written to the device."""
+
+    def __init__(self):
+        self.bytes_sent = 0
+        # dot rows sent as raster and blank rows turned into paper feed
+        self.rows_printed = 0
+        self.rows_fed = 0
+        self.started = time.monotonic()
+        self.first_line = None
+        self.finished = None
+
+    @property
+    def elapsed(self):
+        return (self.finished or time.monotonic()) - self.started
+
+    @property
+    def time_to_first_line(self):
+        if self.first_line is None:
+            return None
+        return self.first_line - self.started
+
+    @property
+    def bytes_per_sec(self):
+        elapsed = self.elapsed
+        return self.bytes_sent / elapsed if elapsed > 0 else 0.0
+
+    def __str__(self):
+        first = self.time_to_first_line
+        first = f"{first * 1000:.0f} ms" if first is not None else "-"
+        return (
+            f"{self.bytes_sent} bytes in {self.elapsed:.2f} s "
+            f"({self.bytes_per_sec:.0f} B/s), first line after {first}, "
+            f"{self.rows_printed} rows printed, {self.rows_fed} fed"
+        )
+
+
+class EscPosPrinter:
+    def __init__(
+        self,
+        device=None,
+        baudrate=None,
+        flow_control=None,
+        dot_print_time=None,
+        dot_feed_time=None,
+        trim=True,
+        trim_left=None,
+    ):
+        self.device = device or config.PRINTER_DEVICE
+        self.baudrate = baudrate or config.PRINTER_BAUDRATE
+        self.flow_control = flow_control or config.PRINTER_FLOW_CONTROL
+        if dot_print_time is None:
+            dot_print_time = config.PRINTER_DOT_PRINT_TIME
+        if dot_feed_time is None:
+            dot_feed_time = config.PRINTER_DOT_FEED_TIME
+        self.dot_print_time = dot_print_time
+        self.dot_feed_time = dot_feed_time
+        self.byte_time = BITS_PER_BYTE / self.baudrate
+        # send blank rows as paper feed and cut the blank right margin off
+        self.trim = trim
+        # also cut the left margin, which needs the printer to support GS L
+        self.trim_left = config.PRINTER_TRIM_LEFT if trim_left is None else trim_left
+        self.stats = None
+        self._fd = None
+        self._ready_at = 0.0
+        # set once the printer answered a status query, from then on silence
+        # means it went offline
+        self._answered = False
+        # until when a printer that never answered is not asked again: without
+        # a back channel every query would only wait out its timeout
+        self._silent_until = 0.0
+
+    def open(self):
+        if self._fd is None:
+            if self.bidirectional:
+                # serial and USB printers answer status queries
+                self._fd = os.open(self.device, os.O_RDWR | os.O_NOCTTY)
+            else:
+                self._fd = os.open(
+                    self.device, os.O_WRONLY | os.O_NOCTTY | os.O_CREAT | os.O_APPEND, 0o644
+                )
+            if os.isatty(self._fd):
+                self._configure_tty()
+        return self
+
+    @property
+    def bidirectional(self):
+        try:
+            return stat.S_ISCHR(os.stat(self.device).st_mode)
+        except OSError:
+            return False
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _configure_tty(self):
+        tty.setraw(self._fd)
+        attrs = termios.tcgetattr(self._fd)
+        speed = getattr(termios, f"B{self.baudrate}")
+        attrs[4] = attrs[5] = speed
+        crtscts = getattr(termios, "CRTSCTS", 0)
+        if self.flow_control == "rtscts":
+            attrs[2] |= crtscts
+        else:
+            attrs[2] &= ~crtscts
+        if self.flow_control == "xonxoff":
+            attrs[0] |= termios.IXON | termios.IXOFF
+        else:
+            attrs[0] &= ~(termios.IXON | termios.IXOFF)
+        termios.tcsetattr(self._fd, termios.TCSANOW, attrs)
+
+    def wait_idle(self):
+        """Block until the printer should have worked off everything sent."""
+        delay = self._ready_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def _write(self, data, print_rows=0, feed_rows=0):
+        # Without flow control the printer silently drops what overflows its
+        # small buffer, so wait until it has worked off the previous write.
+        if self.flow_control == "none":
+            self.wait_idle()
+        view = memoryview(data)
+        while view:
+            view = view[os.write(self._fd, view):]
+        if self.stats is not None:
+            self.stats.bytes_sent += len(data)
+        if self.flow_control == "none":
+            self._ready_at = (
+                time.monotonic()
+                + len(data) * self.byte_time
+                + print_rows * self.dot_print_time
+                + feed_rows * self.dot_feed_time
+            )
+
+    def _status_byte(self, n, timeout):
+        os.write(self._fd, DLE + EOT + bytes([n]))
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return None
+        reply = os.read(self._fd, 1)
+        # status bytes always have bit 1 and 4 set and bit 0 and 7 clear
+        if not reply or reply[0] & 0x93 != 0x12:
+            return None
+        return reply[0]
+
+    def query_status(self, timeout=0.5, recheck=30.0):
+        """Ask the printer with `DLE EOT`, "" when it is ready, else the fault.
+
+        Printers that never answered (no back channel, plain files, or off
+        when first asked) count as ready and are asked again after `recheck`
+        seconds.
+        """
+        if time.monotonic() < self._silent_until:
+            return ""
+        self.open()
+        if not self.bidirectional:
+            return ""
+        if os.isatty(self._fd):
+            # drop stale bytes, so the next byte read is the reply
+            termios.tcflush(self._fd, termios.TCIFLUSH)
+        printer = self._status_byte(1, timeout)
+        if printer is None:
+            if self._answered:
+                return "offline (no status reply)"
+            self._silent_until = time.monotonic() + recheck
+            return ""
+        self._answered = True
+        paper = self._status_byte(4, timeout)
+        # paper roll sensor: bits 5 and 6 mean the paper end was detected
+        if paper is not None and paper & 0x60:
+            return "paper out"
+        if printer & 0x08:
+            return "offline"
+        return ""
+
+    def print_raster(self, bands, feed_lines=3, stats=None):
+        """Write an iterable of boolean bands, returning the job's PrintStats.
+
+        With `trim`, runs of blank rows become `ESC J` paper feed, which the
+        printer moves through far faster than printed dot rows, and inked
+        runs are only sent as wide as their ink reaches.
+        """
+        self.open()
+        self.stats = stats = stats or PrintStats()
+        self._write(INIT)
+        self._blank = 0
+        self._margin = 0
+        for band in bands:
+            if not self.trim:
+                self._write(raster_command(band), print_rows=len(band))
+                stats.rows_printed += len(band)
+            else:
+                for inked, start, stop in printing.row_runs(band):
+                    if inked:
+                        self._print_run(band[start:stop])
+                    else:
+                        self._blank += stop - start
+            if stats.first_line is None:
+                stats.first_line = time.monotonic()
+        if self._margin:
+            self._write(left_margin_command(0))
+        # blank rows at the end are covered by the final feed
+        stats.rows_fed += self._blank
+        self._write(feed_command(feed_lines), feed_rows=feed_lines * 24)
+        stats.finished = time.monotonic()
+        return stats
+
+    def _print_run(self, rows):
+        while self._blank:
+            dots = min(255, self._blank)
+            self._write(feed_dots_command(dots), feed_rows=dots)
+            self.stats.rows_fed += dots
+            self._blank -= dots
+        first, last = printing.ink_columns(rows)
+        left = (first // 8) * 8 if self.trim_left else 0
+        if left != self._margin:
+            self._write(left_margin_command(left))
+            self._margin = left
+        # whole bytes up to the last inked dot
+        right = -(-last // 8) * 8
+        self._write(raster_command(rows[:, left:right]), print_rows=len(rows))
+        self.stats.rows_printed += len(rows)
+
+    def print_image(self, source, method="floyd-steinberg", order="RGB", band_height=24):
+        """Prepare `source` and stream it band by band while it is dithered."""
+        stats = PrintStats()
+        gray = printing.prepare_gray(source, order=order, lut=printing.DEFAULT_CURVE)
+        return self.print_raster(printing.iter_dither(gray, method, band_height), stats=stats)
+
+    def print_text(self, text, feed_lines=3):
+        """Print text as a raster caption, independent of the printer's code page."""
+        return self.print_raster([printing.render_caption(text)], feed_lines)
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""Stand-in for CUPS' lp and lpstat that records jobs instead of printing.
+
+As lp it appends one JSON line per job to $FAKE_LP_LOG and answers like lp
+does.  FAKE_LP_DELAY adds a simulated spooler delay in seconds.
+
+A job sent with `-H hold` is logged as "held" and only counts as printed
+once `lp -i <id> -H resume` logged a "resume" line for it; resuming a job
+that is not held fails like lp does.  Called with -W (as lpstat) it lists
+the held jobs as pending, every other job is finished right away.
+
+Called with -p (as lpstat) it reports the printer state read from the file
+$FAKE_LP_STATE_DIR/<destination>: empty or missing is ready, "paper-out"
+and "offline" make it report those faults.
+"""
+
+import fcntl
+import json
+import os
+import sys
+import time
+
+# lp options that take a value
+VALUE_OPTIONS = {"-d", "-o", "-t", "-n", "-q", "-H", "-P", "-U"}
+
+
+def printer_status(args):
+    names = [arg for arg in args if not arg.startswith("-")]
+    name = names[0] if names else "default"
+    state = ""
+    state_dir = os.environ.get("FAKE_LP_STATE_DIR")
+    if state_dir and os.path.exists(os.path.join(state_dir, name)):
+        with open(os.path.join(state_dir, name)) as file:
+            state = file.read().strip()
+    since = time.strftime("%a %d %b %Y %H:%M:%S")
+    if state == "offline":
+        print(f"printer {name} disabled since {since} -")
+        print("\tAlerts: offline-report")
+    else:
+        print(f"printer {name} is idle.  enabled since {since}")
+        print("\tAlerts: " + ("media-empty-error" if state == "paper-out" else "none"))
+    return 0
+
+
+def read_log(log):
+    log.seek(0)
+    return [json.loads(line) for line in log]
+
+
+def held_jobs(records):
+    held = {r["id"] for r in records if r.get("held")}
+    return held - {r["resume"] for r in records if "resume" in r}
+
+
+def resume(job_id, log_path):
+    with open(log_path, "a+") as log:
+        fcntl.flock(log, fcntl.LOCK_EX)
+        if job_id not in held_jobs(read_log(log)):
+            print(f"lp: Job #{job_id} is not held.", file=sys.stderr)
+            return 1
+        log.write(json.dumps({"resume": job_id, "time": time.time()}) + "\n")
+    return 0
+
+
+def main(args):
+    time.sleep(float(os.environ.get("FAKE_LP_DELAY", "0")))
+    log_path = os.environ.get("FAKE_LP_LOG", "fake_lp.jsonl")
+    if "-i" in args:
+        return resume(args[args.index("-i") + 1], log_path)
+    if "-W" in args:
+        if os.path.exists(log_path):
+            with open(log_path) as log:
+                for job_id in sorted(held_jobs(read_log(log))):
+                    print(f"{job_id}  user  1024  {time.strftime('%c')}")
+        return 0
+    if "-p" in args:
+        return printer_status(args)
+    options = []
+    files = []
+    it = iter(args)
+    for arg in it:
+        if arg in VALUE_OPTIONS:
+            options.append([arg, next(it, "")])
+        elif arg.startswith("-"):
+            options.append([arg])
+        else:
+            files.append({"name": arg, "size": os.path.getsize(arg)})
+    stdin_bytes = 0 if files else len(sys.stdin.buffer.read())
+    title = next((option[1] for option in options if option[0] == "-t"), None)
+    job_id = f"fake-{os.getpid()}-{time.time_ns() % 10**9}"
+    record = {
+        "id": job_id,
+        "time": time.time(),
+        "options": options,
+        "files": files,
+        "stdin_bytes": stdin_bytes,
+    }
+    if title:
+        record["title"] = title
+    if ["-H", "hold"] in options:
+        record["held"] = True
+    with open(log_path, "a") as log:
+        # several lp processes may run at once
+        fcntl.flock(log, fcntl.LOCK_EX)
+        log.write(json.dumps(record) + "\n")
+    print(f"request id is {job_id} ({max(1, len(files))} file(s))")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
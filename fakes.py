@@ -0,0 +1,212 @@
+"""Stand-ins for the camera and the spooler, to run the booth off-device.
+
+FakePicamera2 implements the part of the Picamera2 API that camera.py uses
+and delivers synthetic frames from a background thread after a simulated
+frame period or mode-switch delay.  FakeQGlPicamera2 replaces the OpenGL
+preview widget.  fake_lp.py is the matching stand-in for lp/lpstat, and
+FakeEscPosDevice a pty acting as a directly attached printer.
+"""
+
+import itertools
+import os
+import select
+import threading
+
+import numpy as np
+from PyQt5.QtCore import pyqtSignal
+from PyQt5.QtWidgets import QLabel
+
+FAKE_LP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_lp.py")
+
+
+class FakeJob:
+    def __init__(self):
+        self.result = None
+        self._done = threading.Event()
+
+    def wait(self, timeout=None):
+        self._done.wait(timeout)
+        return self.result
+
+
+class FakePicamera2:
+    def __init__(self, sensor_size=(4056, 3040), frame_period=1 / 30, switch_delay=0.4):
+        self.sensor_size = sensor_size
+        self.frame_period = frame_period
+        # stopping, reconfiguring and restarting the sensor on a mode switch
+        self.switch_delay = switch_delay
+        self.camera_properties = {"Model": "fake"}
+        self.camera_config = None
+        self.started = False
+        self.mode_switches = 0
+        self.frames = itertools.count()
+        self._frames = {}
+
+    def _config(self, main=None, lores=None, display="main", default_size=(640, 480)):
+        main = dict(main or {})
+        main.setdefault("size", default_size)
+        main.setdefault("format", "XBGR8888")
+        config = {"main": main, "display": display}
+        if lores:
+            config["lores"] = dict(lores)
+        return config
+
+    def create_preview_configuration(self, main=None, lores=None, display="main"):
+        return self._config(main, lores, display)
+
+    def create_still_configuration(self, main=None, lores=None, display=None):
+        return self._config(main, lores, display, default_size=self.sensor_size)
+
+    def configure(self, config):
+        self.camera_config = config
+
+    def start(self):
+        self.started = True
+
+    def stop(self):
+        self.started = False
+
+    def close(self):
+        self.stop()
+
+    def frame(self, name="main"):
+        """A synthetic frame of the configured stream (copied like a real capture)."""
+        stream = self.camera_config[name]
+        w, h = stream["size"]
+        key = (name, w, h, stream.get("format"))
+        if key not in self._frames:
+            x = np.linspace(0, 255, w, dtype=np.float32)
+            y = np.linspace(0, 255, h, dtype=np.float32)[:, None]
+            gray = ((x + y) / 2).astype(np.uint8)
+            if name == "lores":
+                self._frames[key] = gray
+            else:
+                channels = 3 if stream.get("format") in ("RGB888", "BGR888") else 4
+                self._frames[key] = np.repeat(gray[:, :, None], channels, axis=2)
+        next(self.frames)
+        return self._frames[key].copy()
+
+    def _run_job(self, delay, work, signal_function, wait):
+        job = FakeJob()
+
+        def complete():
+            job.result = work()
+            job._done.set()
+            if signal_function is not None:
+                signal_function(job)
+
+        if wait or wait is None and signal_function is None:
+            threading.Event().wait(delay)
+            complete()
+            return job.result
+        threading.Timer(delay, complete).start()
+        return job
+
+    def wait(self, job, timeout=None):
+        return job.wait(timeout)
+
+    def capture_array(self, name="main", wait=None, signal_function=None):
+        return self._run_job(self.frame_period, lambda: self.frame(name), signal_function, wait)
+
+    def capture_metadata(self, wait=None, signal_function=None):
+        return self._run_job(
+            self.frame_period, lambda: {"FrameDuration": 33333}, signal_function, wait
+        )
+
+    def switch_mode(self, config, wait=None, signal_function=None):
+        self.mode_switches += 1
+
+        def work():
+            self.configure(config)
+            return config
+
+        return self._run_job(self.switch_delay, work, signal_function, wait)
+
+    def switch_mode_and_capture_array(
+        self, config, name="main", wait=None, signal_function=None, delay=0
+    ):
+        self.mode_switches += 2
+        preview = self.camera_config
+
+        def work():
+            self.camera_config = config
+            frame = self.frame(name)
+            self.camera_config = preview
+            return frame
+
+        # one switch to the still mode and one back to the preview
+        return self._run_job(
+            2 * self.switch_delay + self.frame_period, work, signal_function, wait
+        )
+
+
+class FakeQGlPicamera2(QLabel):
+    done_signal = pyqtSignal(object)
+
+    def __init__(self, picam2, width=640, height=480, keep_ar=True):
+        super().__init__("fake preview")
+        self.picam2 = picam2
+        self.resize(width, height)
+
+    def signal_done(self, job):
+        self.done_signal.emit(job)
+
+
+def fake_cups_backend(log_path, destination=""):
+    """A CupsBackend whose lp and lpstat are fake_lp.py, recording to `log_path`."""
+    from print_queue import CupsBackend
+
+    os.environ["FAKE_LP_LOG"] = log_path
+    return CupsBackend(destination, lp=FAKE_LP, lpstat=FAKE_LP)
+
+
+class FakeEscPosDevice:
+    """A pty that swallows ESC/POS data and answers `DLE EOT` status queries.
+
+    Pass `path` as the printer device.  Set `paper_out` or `offline` to make
+    it report those faults, `silent` to stop it answering at all.
+    """
+
+    def __init__(self):
+        self.master, self._slave = os.openpty()
+        self.path = os.ttyname(self._slave)
+        self.paper_out = False
+        self.offline = False
+        self.silent = False
+        self.received = 0
+        self._closed = False
+        threading.Thread(target=self._run, name="fake-escpos", daemon=True).start()
+
+    def _reply(self, n):
+        if n == 1:
+            return 0x12 | (0x08 if self.offline or self.paper_out else 0)
+        if n == 4:
+            return 0x12 | (0x60 if self.paper_out else 0)
+        return 0x12
+
+    def _run(self):
+        tail = b""
+        while not self._closed:
+            ready, _, _ = select.select([self.master], [], [], 0.1)
+            if not ready:
+                continue
+            try:
+                data = os.read(self.master, 65536)
+            except OSError:
+                return
+            self.received += len(data)
+            # a request may be split over two reads
+            data = tail + data
+            start = 0
+            while True:
+                i = data.find(b"\x10\x04", start)
+                if i < 0 or i + 2 >= len(data):
+                    break
+                if not self.silent:
+                    os.write(self.master, bytes([self._reply(data[i + 2])]))
+                start = i + 3
+            tail = data[-2:]
+
+    def close(self):
+        self._closed = True
+        os.close(self._slave)
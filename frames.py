@@ -0,0 +1,80 @@
+"""Helpers for keeping captured frames in memory.
+
+Frames travel as numpy arrays from the camera to print preparation and the
+drawing canvas; writing them to disk is an optional archival step done on a
+background thread.
+"""
+
+import queue
+import threading
+
+import numpy as np
+from PyQt5.QtGui import QImage
+
+import timing
+
+
+def array_to_qimage(frame):
+    """Wrap a frame array in a QImage without copying.
+
+    3 channel frames are expected in Picamera2's BGR byte order.  The QImage
+    points into the array, so the array has to outlive it.
+    """
+    frame = np.ascontiguousarray(frame)
+    h, w = frame.shape[:2]
+    if frame.ndim == 2:
+        fmt = QImage.Format.Format_Grayscale8
+    elif frame.shape[2] == 4:
+        fmt = QImage.Format.Format_RGB32
+    else:
+        fmt = QImage.Format.Format_BGR888
+    image = QImage(frame.data, w, h, frame.strides[0], fmt)
+    # keep the buffer alive as long as the wrapper
+    image.ndarray = frame
+    return image
+
+
+def qimage_to_array(image):
+    """Return the pixels of a QImage as an array (HxW gray or HxWx4 BGRX)."""
+    if image.format() == QImage.Format.Format_Grayscale8:
+        channels = 1
+    else:
+        if image.format() != QImage.Format.Format_RGB32:
+            image = image.convertToFormat(QImage.Format.Format_RGB32)
+        channels = 4
+    h, w = image.height(), image.width()
+    bits = image.constBits()
+    bits.setsize(image.bytesPerLine() * h)
+    rows = np.frombuffer(bits, np.uint8).reshape(h, image.bytesPerLine())
+    frame = rows[:, : w * channels].copy()
+    return frame if channels == 1 else frame.reshape(h, w, 4)
+
+
+class ArchiveWriter:
+    """Encode and write frames to disk on a single background thread."""
+
+    def __init__(self):
+        self._pending = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="archive", daemon=True)
+        self._thread.start()
+
+    def write(self, frame, path, order="BGR"):
+        self._pending.put((frame, path, order))
+
+    def flush(self):
+        self._pending.join()
+
+    def _run(self):
+        from PIL import Image
+
+        while True:
+            frame, path, order = self._pending.get()
+            try:
+                with timing.span("archive_write"):
+                    if frame.ndim == 3:
+                        frame = frame[..., 2::-1] if order == "BGR" else frame[..., :3]
+                    Image.fromarray(np.ascontiguousarray(frame)).save(path, quality=90)
+            except Exception as error:
+                print(f"could not archive {path}: {error}")
+            finally:
+                self._pending.task_done()
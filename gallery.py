@@ -0,0 +1,114 @@
+"""Scrollable gallery of the session's photos, for reprinting.
+
+Only thumbnails from the session index are shown, and they are loaded a
+page at a time as the list is scrolled, so opening the gallery does not
+depend on how many photos an event produced.
+"""
+
+from PyQt5.QtCore import QDir, QUrl, Qt, pyqtSignal
+from PyQt5.QtGui import QDesktopServices, QGuiApplication, QImage, QPixmap
+from PyQt5.QtWidgets import (
+    QDialog,
+    QGridLayout,
+    QLabel,
+    QPushButton,
+    QScrollArea,
+    QVBoxLayout,
+    QWidget,
+)
+
+COLUMNS = 4
+PAGE = 24
+
+
+class ImageView(QWidget):
+    reprint = pyqtSignal(int)
+
+    def __init__(self, previewImage, fileName, description, photo_id=None, printed=0):
+        super().__init__()
+
+        self._file_name = fileName
+        self.photo_id = photo_id
+        self.printing_status = ""
+        main_layout = QVBoxLayout(self)
+        self._image_label = QLabel()
+        self._image_label.setPixmap(QPixmap.fromImage(previewImage))
+        main_layout.addWidget(self._image_label)
+        self._file_name_label = QLabel(QDir.toNativeSeparators(fileName))
+        self.description = QLabel(description)
+        self.description.setWordWrap(True)
+
+        main_layout.addWidget(self._file_name_label)
+        main_layout.addWidget(self.description)
+        if photo_id is not None:
+            self._print_button = QPushButton()
+            self._print_button.clicked.connect(lambda: self.reprint.emit(self.photo_id))
+            self.set_printed(printed)
+            main_layout.addWidget(self._print_button)
+        main_layout.setSpacing(0)
+        main_layout.addStretch(10)
+
+    def set_printed(self, printed):
+        self._print_button.setText(f"Print again ({printed}x printed)")
+
+    def copy(self):
+        QGuiApplication.clipboard().setText(self._file_name_label.text())
+
+    def launch(self):
+        QDesktopServices.openUrl(QUrl.fromLocalFile(self._file_name))
+
+
+class GalleryDialog(QDialog):
+    reprint = pyqtSignal(int)
+
+    def __init__(self, session, parent=None):
+        super().__init__(parent)
+        self.session = session
+        self.views = {}
+        self.setWindowTitle("Gallery")
+        self._total = session.count()
+
+        self._grid_widget = QWidget()
+        self._grid = QGridLayout(self._grid_widget)
+        self._grid.setAlignment(Qt.AlignTop)
+        self._scroll = QScrollArea()
+        self._scroll.setWidgetResizable(True)
+        self._scroll.setWidget(self._grid_widget)
+        self._scroll.verticalScrollBar().valueChanged.connect(self._scrolled)
+
+        close_button = QPushButton("Back to camera")
+        close_button.clicked.connect(self.reject)
+        layout = QVBoxLayout(self)
+        layout.addWidget(QLabel(f"{self._total} photos"))
+        layout.addWidget(self._scroll)
+        layout.addWidget(close_button)
+        self.load_more()
+
+    def load_more(self):
+        loaded = len(self.views)
+        for photo, thumbnail in self.session.page(loaded, PAGE):
+            image = QImage.fromData(thumbnail) if thumbnail else QImage()
+            view = ImageView(image, photo.file, photo.description, photo.id, photo.printed)
+            view.reprint.connect(self.reprint)
+            self._grid.addWidget(view, len(self.views) // COLUMNS, len(self.views) % COLUMNS)
+            self.views[photo.id] = view
+
+    def _scrolled(self, value):
+        bar = self._scroll.verticalScrollBar()
+        if len(self.views) < self._total and value >= bar.maximum() - bar.pageStep() // 2:
+            self.load_more()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        # fill the visible area even when the first page does not need a scrollbar
+        self._grid_widget.adjustSize()
+        while len(self.views) < self._total and not self._scroll.verticalScrollBar().maximum():
+            before = len(self.views)
+            self.load_more()
+            if len(self.views) == before:
+                break
+            self._grid_widget.adjustSize()
+
+    def set_printed(self, photo_id, printed):
+        if photo_id in self.views:
+            self.views[photo_id].set_printed(printed)
@@ -0,0 +1,76 @@
+"""Caption text rasterized from a pre-rendered glyph atlas.
+
+Each glyph of a monospace font is drawn once into a fixed printer cell and
+kept as a boolean bitmap, so a caption is an index lookup plus one reshape
+instead of font rasterization per job.  The text never reaches the printer
+as characters, so umlauts, ß, § and ° print the same on every printer
+regardless of its code page.
+"""
+
+import functools
+import threading
+
+import numpy as np
+
+# printable ASCII and Latin-1, covering the keyboard layouts; other
+# characters are added to the atlas the first time they are used
+CHARSET = "".join(chr(c) for c in range(0x20, 0x7F)) + "".join(
+    chr(c) for c in range(0xA0, 0x100)
+) + "€–—‘’“”„…•"
+
+
+class GlyphAtlas:
+    def __init__(self, font_path, cell_width, cell_height, charset=CHARSET):
+        self.font_path = font_path
+        self.cell_width = cell_width
+        self.cell_height = cell_height
+        self._font = self._load_font()
+        # print workers of a printer pool share the atlas
+        self._lock = threading.Lock()
+        self.index = {}
+        self.glyphs = np.zeros((0, cell_height, cell_width), dtype=bool)
+        with self._lock:
+            self.add(charset)
+
+    def _load_font(self):
+        from PIL import ImageFont
+
+        # a monospace advance is 0.6 em, so this size fills the cell width
+        size = int(self.cell_width / 0.6)
+        try:
+            return ImageFont.truetype(self.font_path, size)
+        except OSError:
+            return ImageFont.load_default(size)
+
+    def add(self, chars):
+        """Render the glyphs of `chars` that are not in the atlas yet (under the lock)."""
+        from PIL import Image, ImageDraw
+
+        new = [c for c in dict.fromkeys(chars) if c not in self.index]
+        if not new:
+            return
+        bitmaps = []
+        for char in new:
+            img = Image.new("1", (self.cell_width, self.cell_height), 0)
+            ImageDraw.Draw(img).text((0, 0), char, fill=1, font=self._font)
+            self.index[char] = len(self.index)
+            bitmaps.append(np.asarray(img, dtype=bool))
+        self.glyphs = np.concatenate([self.glyphs, np.stack(bitmaps)])
+
+    def render(self, lines, columns):
+        """Rasterize lines of at most `columns` characters, one cell row each."""
+        with self._lock:
+            self.add("".join(lines))
+            codes = np.full((len(lines), columns), self.index[" "], dtype=np.intp)
+            for row, line in enumerate(lines):
+                codes[row, : len(line)] = [self.index[c] for c in line[:columns]]
+            glyphs = self.glyphs
+        # (lines, columns, h, w) -> (lines, h, columns, w) -> rows of dots
+        cells = glyphs[codes].transpose(0, 2, 1, 3)
+        return cells.reshape(len(lines) * self.cell_height, columns * self.cell_width)
+
+
+@functools.lru_cache(maxsize=8)
+def atlas(font_path, cell_width, cell_height):
+    """The glyph atlas of a font at one cell size, built once per process."""
+    return GlyphAtlas(font_path, cell_width, cell_height)
@@ -0,0 +1,237 @@
+"""Append-only spool journal, so queued prints survive a crash or power loss.
+
+Every job is recorded when it is submitted, after its input has been copied
+to the spool directory, and later states are one more JSON line each.  One
+thread writes the records and fsyncs once per batch: whatever was appended
+while the previous fsync ran goes out with the next one.  On start the
+journal is read back, jobs without a final state are handed to the print
+queue again and the file is compacted to just those.
+
+A job recorded as sent is waited for by its CUPS request ids instead of
+being sent again.  CUPS holds a journaled job until its "sent" record is on
+disk, so a crash before that leads to a second submission, but the first
+one stays held and never prints.  Jobs carry their spool id as the CUPS job
+title, to tell such leftovers apart.
+"""
+
+import json
+import os
+import queue
+import threading
+import uuid
+
+import numpy as np
+
+import printing
+
+JOURNAL_NAME = "journal.jsonl"
+FINAL_STATES = ("done", "failed")
+
+
+def _fsync_dir(directory):
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _write_durably(path, write):
+    """Write a file under a temporary name, fsync it and move it into place."""
+    with open(path + ".tmp", "wb") as file:
+        write(file)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(path + ".tmp", path)
+
+
+class Journal:
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.path = os.path.join(directory, JOURNAL_NAME)
+        self.batches = 0
+        self.records = 0
+        self._pending = queue.Queue()
+        self._lock = threading.Lock()
+        self._durable = threading.Condition()
+        self._seq = 0
+        self._written = 0
+        # the records of the jobs that were not finished at the last exit
+        self.unfinished = self._recover()
+        self._file = open(self.path, "ab")
+        self._thread = threading.Thread(target=self._run, name="spool-journal", daemon=True)
+        self._thread.start()
+
+    def _recover(self):
+        jobs = {}
+        if os.path.exists(self.path):
+            with open(self.path, "rb") as file:
+                for line in file:
+                    # a torn write at the end is the crash, nothing after it counts
+                    if not line.endswith(b"\n"):
+                        break
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break
+                    if record.get("op") == "submit":
+                        jobs[record["id"]] = record
+                    elif record["id"] in jobs:
+                        jobs[record["id"]].update(
+                            (k, v) for k, v in record.items() if k not in ("op", "id")
+                        )
+        unfinished = [r for r in jobs.values() if r.get("state") not in FINAL_STATES]
+
+        def write(file):
+            for record in unfinished:
+                file.write(json.dumps(dict(record, op="submit")).encode() + b"\n")
+
+        _write_durably(self.path, write)
+        _fsync_dir(self.directory)
+        keep = {record["id"] for record in unfinished}
+        for name in os.listdir(self.directory):
+            if name != JOURNAL_NAME and name.split(".")[0] not in keep:
+                os.remove(os.path.join(self.directory, name))
+        return unfinished
+
+    def _append(self, record, work=None):
+        with self._lock:
+            self._seq += 1
+            seq = self._seq
+            self._pending.put((seq, record, work))
+        return seq
+
+    def _run(self):
+        while True:
+            item = self._pending.get()
+            stop = item is None
+            batch = [] if stop else [item]
+            while not stop:
+                try:
+                    item = self._pending.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                else:
+                    batch.append(item)
+            if batch:
+                self._write_batch(batch)
+            if stop:
+                return
+
+    def _write_batch(self, batch):
+        lines = []
+        for seq, record, work in batch:
+            if work is not None:
+                try:
+                    work(record)
+                except Exception as error:
+                    record["error"] = f"not spooled: {error}"
+            lines.append(json.dumps(record).encode() + b"\n")
+        # spooled files are fsynced by `work`, their names by this
+        _fsync_dir(self.directory)
+        self._file.write(b"".join(lines))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.batches += 1
+        self.records += len(batch)
+        with self._durable:
+            self._written = batch[-1][0]
+            self._durable.notify_all()
+
+    def wait(self, seq, timeout=None):
+        """Block until the record `seq` and all before it are on disk."""
+        with self._durable:
+            return self._durable.wait_for(lambda: self._written >= seq, timeout)
+
+    def _file_path(self, job_id, suffix):
+        return os.path.join(self.directory, job_id + suffix)
+
+    def submit(self, job, raster=None):
+        """Record a new job, returns the sequence number to `wait` for.
+
+        A job rendered ahead of time is spooled as its `raster`, else the
+        input is.  Either is written here on the journal thread.
+        """
+        job.spool_id = uuid.uuid4().hex
+        record = {
+            "op": "submit",
+            "id": job.spool_id,
+            "text": job.text,
+            "order": job.order,
+            "caption": job.caption,
+            "method": job.method,
+        }
+
+        def work(record):
+            if raster is not None:
+                self._save_raster(job, record, raster)
+            else:
+                self._save_input(job, record)
+
+        return self._append(record, work)
+
+    def _save_input(self, job, record):
+        image = job.image
+        if isinstance(image, np.ndarray):
+            # the frame reduced to the print width prints the same and is a
+            # fraction of the size of a full still; the job prints from it
+            # too, so the frame is reduced once and not kept while queued
+            gray = np.round(printing.prepare_gray(image, order=job.order)).astype(np.uint8)
+            path = self._file_path(record["id"], ".npy")
+            _write_durably(path, lambda file: np.save(file, gray))
+            record["input"] = {"kind": "gray", "path": os.path.basename(path)}
+            job.image = gray
+        elif isinstance(image, bytes):
+            path = self._file_path(record["id"], ".img")
+            _write_durably(path, lambda file: file.write(image))
+            record["input"] = {"kind": "bytes", "path": os.path.basename(path)}
+        elif image is not None:
+            record["input"] = {"kind": "path", "path": os.path.abspath(image)}
+
+    def load_input(self, record):
+        """The image of a recovered job, as PrintJob takes it."""
+        source = record.get("input")
+        if source is None:
+            return None
+        if source["kind"] == "path":
+            return source["path"]
+        path = os.path.join(self.directory, source["path"])
+        if source["kind"] == "gray":
+            return np.load(path)
+        with open(path, "rb") as file:
+            return file.read()
+
+    def record(self, job, state, **fields):
+        return self._append({"op": "state", "id": job.spool_id, "state": state, **fields})
+
+    def save_raster(self, job, bits):
+        """Spool the rendered raster, so a replay does not render again."""
+        return self._append(
+            {"op": "rendered", "id": job.spool_id},
+            lambda record: self._save_raster(job, record, bits),
+        )
+
+    def _save_raster(self, job, record, bits):
+        path = self._file_path(job.spool_id, ".pbm")
+        _write_durably(path, lambda file: file.write(printing.pbm_bytes(bits)))
+        record["raster"] = os.path.basename(path)
+        job.raster = path
+
+    def raster_path(self, record):
+        return os.path.join(self.directory, record["raster"]) if record.get("raster") else None
+
+    def discard(self, job):
+        """Remove the spooled files of a finished job (after its final record is durable)."""
+        for suffix in (".npy", ".img", ".pbm"):
+            try:
+                os.remove(self._file_path(job.spool_id, suffix))
+            except OSError:
+                pass
+
+    def close(self):
+        self._pending.put(None)
+        self._thread.join()
+        self._file.close()
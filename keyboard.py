@@ -3,15 +3,13 @@
 import os
 import sys
 from PyQt5.QtCore import QDate, QDir, QStandardPaths, Qt, QUrl, QTimer
-from PyQt5.QtGui import QPalette, QColor, QMouseEvent
+from PyQt5.QtGui import QPalette, QColor, QMouseEvent, QFont, QFontMetrics, QPainter
 from PyQt5.QtWidgets import (
     QApplication,
     QDialogButtonBox,
     QLabel,
     QMainWindow,
     QPushButton,
-    QTabWidget,
-    QButtonGroup,
     QVBoxLayout,
     QWidget,
     QHBoxLayout,
@@ -20,6 +18,10 @@ from PyQt5.QtWidgets import (
     QGridLayout,
 )
 
+import config
+import timing
+from textlayout import TextBuffer
+
 
 colors = ["red", "blue", "orange", "green"]
 
@@ -135,143 +137,174 @@ capitalkeys = [
 ]
 
 
+# one stylesheet for the whole keyboard, buttons pick their color through
+# the "keycolor" property instead of parsing a stylesheet each
+KEYBOARD_STYLE = """
+KeyButton { color: black; background-color: white; padding: 2px; margin: 0px; }
+KeyButton[keycolor="red"] { background-color: red; }
+KeyButton[keycolor="blue"] { background-color: blue; }
+KeyButton[keycolor="orange"] { background-color: orange; }
+KeyButton[keycolor="gray"] { background-color: gray; }
+KeyButton[keycolor="save"] { background-color: #0f0; }
+"""
+
+
 class KeyButton(QPushButton):
-    def __init__(self, color, k, func):
+    def __init__(self, color, k, func, capital=None):
         super(QPushButton, self).__init__(k)
         self.setAutoFillBackground(True)
+        self.setProperty("keycolor", color)
         self.kval = k
+        self.small = k
+        # the label on the capital layer, the same for special keys
+        self.capital = k if capital is None else capital
         self.parentfunc = func
-        self.setStyleSheet(
-            "color: black;" f"background-color: {color}; padding: 2px; margin: 0px; "
-        )
         self.clicked.connect(self.click_key)
 
+    def set_color(self, color):
+        self.setProperty("keycolor", color)
+        self.style().unpolish(self)
+        self.style().polish(self)
+
+    def set_capital(self, capital):
+        self.kval = self.capital if capital else self.small
+        self.setText(self.kval)
+
     def click_key(self, e):
         self.parentfunc(self.kval)
 
 
+class KeyboardWidget(QWidget):
+    """German keyboard whose small and capital layers share one set of buttons."""
+
+    def __init__(self, key_func, save_func, parent=None):
+        super().__init__(parent)
+        self.setStyleSheet(KEYBOARD_STYLE)
+        layout = QGridLayout(self)
+        layout.setSpacing(0)
+        layout.setContentsMargins(0, 0, 0, 0)
+        self.buttons = []
+        self.capital = False
+        row = 0
+        total = 0
+        for i, k in enumerate(smallkeys):
+            col = i - total
+            if k in ("tab", "lock", "shift", "space"):
+                row = {"tab": 1, "lock": 2, "shift": 3, "space": 4}[k]
+                total = i
+                button = KeyButton("gray" if k == "space" else "white", k, key_func)
+                layout.addWidget(button, row, 0)
+                if k == "lock":
+                    self.lock_button = button
+                if k == "space":
+                    layout.addWidget(KeyButton("save", "save", save_func), row, 12)
+            else:
+                button = KeyButton(colors[i % 3], k, key_func, capitalkeys[i])
+                layout.addWidget(button, row, col)
+                self.buttons.append(button)
+
+    def set_capital(self, capital, locked=False):
+        if capital != self.capital:
+            self.capital = capital
+            for button in self.buttons:
+                button.set_capital(capital)
+        self.lock_button.set_color("gray" if locked else "white")
+
+
+class PrinterPreview(QWidget):
+    """The description as the printer will wrap it, newest lines visible."""
+
+    def __init__(self, buffer, parent=None):
+        super().__init__(parent)
+        self.buffer = buffer
+        self.font = QFont("DejaVu Sans Mono")
+        self.font.setStyleHint(QFont.StyleHint.Monospace)
+        self.setMinimumHeight(60)
+        self.paper_width = 0
+
+    def resizeEvent(self, event):
+        # size the monospace font so the printer's columns fill the width
+        columns = self.buffer.columns
+        size = max(6, int(self.width() / columns / 0.6))
+        while size > 6:
+            self.font.setPixelSize(size)
+            if QFontMetrics(self.font).horizontalAdvance("M") * columns <= self.width():
+                break
+            size -= 1
+        self.paper_width = QFontMetrics(self.font).horizontalAdvance("M") * columns
+        super().resizeEvent(event)
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), Qt.lightGray)
+        painter.fillRect(0, 0, self.paper_width, self.height(), Qt.white)
+        painter.setFont(self.font)
+        painter.setPen(Qt.black)
+        metrics = QFontMetrics(self.font)
+        visible = max(1, self.height() // metrics.lineSpacing())
+        # only the lines that fit are fetched and drawn, independent of length
+        for i, line in enumerate(self.buffer.lines(last=visible)):
+            painter.drawText(0, i * metrics.lineSpacing() + metrics.ascent(), line)
+
+
 class DescriptionDialog(QDialog):
     def __init__(self, description, parent=None):
         super().__init__(parent)
         self.resize(470, 250)
         self.setWindowTitle("Write Description of Image")
 
-        self.description = description
-        self.description_box = QLabel(self.description)
-
-        self.description_box.setStyleSheet(
-            "color: black; padding: 0px; background-color: white; margin: 0;"
-        )
+        self.buffer = TextBuffer(description, config.CAPTION_COLUMNS)
+        self.description_box = PrinterPreview(self.buffer)
 
-        self.group = QButtonGroup()
-        layout_small = QGridLayout()
-        layout_capital = QGridLayout()
-        layout_small.setSpacing(0)
-        layout_capital.setSpacing(0)
-        layout_small.setContentsMargins(0,0,0,0)
-        layout_capital.setContentsMargins(0,0,0,0)
-        row = 0
-        total = 0
         self.caps_lock = False
         self.caps = False
-        for i, k in enumerate(smallkeys):
-            col = i - total
-            if k == "tab":
-                row = 1
-                total = i
-                button = KeyButton("white", k, self.button_clicked)
-                layout_small.addWidget(button, row, 0)
-                buttonk = KeyButton("white", k, self.button_clicked)
-                layout_capital.addWidget(buttonk, row, 0)
-            elif k == "lock":
-                row = 2
-                total = i
-                button = KeyButton("white", k, self.button_clicked)
-                layout_small.addWidget(button, row, 0)
-                buttonk = KeyButton("gray", k, self.button_clicked)
-                layout_capital.addWidget(buttonk, row, 0)
-            elif k == "shift":
-                row = 3
-                total = i
-                button = KeyButton("white", k, self.button_clicked)
-                layout_small.addWidget(button, row, 0)
-                buttonk = KeyButton("white", k, self.button_clicked)
-                layout_capital.addWidget(buttonk, row, 0)
-            elif k == "space":
-                row = 4
-                total = i
-                button = KeyButton("gray", k, self.button_clicked)
-                layout_small.addWidget(button, row, 0)
-                buttonk = KeyButton("gray", k, self.button_clicked)
-                layout_capital.addWidget(buttonk, row, 0)
-                saveb_small = KeyButton("#0f0", "save", self.accept)
-                saveb_cap = KeyButton("#0f0", "save", self.accept)
-                layout_small.addWidget(saveb_small, row, 12)
-                layout_capital.addWidget(saveb_cap, row, 12)
-            else:
-                color = colors[i % 3]
-                button = KeyButton(color, k, self.button_clicked)
-                layout_small.addWidget(button, row, col)
-                button_cap = KeyButton(color, capitalkeys[i], self.button_clicked)
-                layout_capital.addWidget(button_cap, row, col)
-            self.group.addButton(button)
-        self.tabs = QTabWidget()
-        swidget = QWidget()
-        swidget.setLayout(layout_small)
-        self.tabs.addTab(swidget, "0")
-        cwidget = QWidget()
-        cwidget.setLayout(layout_capital)
-        self.tabs.addTab(cwidget, "1")
-        swidget.setStyleSheet("padding: 0px; margin: 0px;")
-        cwidget.setStyleSheet("padding: 0px; margin: 0px;")
-        self.tabs.setStyleSheet(
-            "QTabWidget::pane { margin: 0px; border: none; padding: 0px; top: -32px;} QTabBar::tab {margin:0px; padding:0px; font-size: 1px;}"
-        )
-        self.tabs.tabBar().setDrawBase(False)
+        self.keyboard = KeyboardWidget(self.button_clicked, self.accept)
         self.layout = QVBoxLayout()
         self.layout.addWidget(self.description_box)
-        self.layout.addWidget(self.tabs)
+        self.layout.addWidget(self.keyboard)
         self.setLayout(self.layout)
 
+    @property
+    def description(self):
+        return self.buffer.text
+
+    def set_description(self, description):
+        """Reuse the dialog for another image."""
+        self.buffer.set_text(description)
+        self.caps = self.caps_lock = False
+        self.keyboard.set_capital(False)
+        self.description_box.update()
+
     def accept(self, e):
         loc = QStandardPaths.writableLocation(
             QStandardPaths.StandardLocation.DesktopLocation
         )
         fn = f"{loc}/description.txt"
-        with open(fn, "w") as file:
+        with timing.span("description_save"), open(fn, "w") as file:
             file.write(self.description)
         super().accept()
 
     def button_clicked(self, x):
         kval = x
         if kval == "tab":
-            self.description += " "
+            self.buffer.append(" ")
         elif kval == "shift":
-            if self.caps or self.caps_lock:
-                self.tabs.setCurrentIndex(0)
-                self.caps = False
-            else:
-                self.tabs.setCurrentIndex(1)
-                self.caps = True
+            self.caps = not (self.caps or self.caps_lock)
+            self.caps_lock = False
         elif kval == "lock":
-            if self.caps_lock:
-                self.tabs.setCurrentIndex(0)
-                self.caps_lock = False
-            else:
-                self.tabs.setCurrentIndex(1)
-                self.caps_lock = True
+            self.caps_lock = not self.caps_lock
+            self.caps = False
         elif kval == "<--":
-            self.description = self.description[0:-1]
+            self.buffer.backspace()
         elif kval == "space":
-            self.description += " "
+            self.buffer.append(" ")
         elif kval == "enter":
-            self.description += "\n"
+            self.buffer.append("\n")
         else:
-            if self.caps:
-                self.caps = False
-                self.tabs.setCurrentIndex(0)
-            self.description += str(kval)
-        self.description_box.setText(self.description)
+            self.caps = False
+            self.buffer.append(str(kval))
+        self.keyboard.set_capital(self.caps or self.caps_lock, self.caps_lock)
+        self.description_box.update()
 
 
 if __name__ == "__main__":
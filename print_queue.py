@@ -0,0 +1,685 @@
+"""Background print queue.
+
+Jobs are rendered and sent by a worker thread, so neither the spooler nor
+the dithering ever block the Qt event loop.  State changes are reported
+through the `job_changed` signal, which Qt delivers in the GUI thread.
+With a spool journal (journal.py) jobs that were not printed when the
+process died are submitted again by the next PrintQueue.
+"""
+
+import hashlib
+import itertools
+import os
+import queue
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+from PyQt5.QtCore import QObject, pyqtSignal
+
+import config
+import printing
+import timing
+
+QUEUED = "queued"
+RENDERING = "rendering"
+SENT = "sent"
+DONE = "done"
+FAILED = "failed"
+
+_job_ids = itertools.count(1)
+
+# bump when the rendering changes, so cached rasters of older code are not reused
+RASTER_VERSION = 2
+
+
+class PrintJob:
+    def __init__(self, image=None, text=None, order="RGB", caption="below", method="floyd-steinberg"):
+        self.id = next(_job_ids)
+        # a file path, the bytes of an image file or a frame array
+        self.image = image
+        self.text = text
+        self.order = order
+        self.method = method
+        # the text is printed as a caption "above" or "below" the image
+        self.caption = caption
+        self.state = QUEUED
+        self.detail = ""
+        self.attempts = 0
+        self.error = ""
+        self.submitted = None
+        self._key = None
+        # set by the spool journal: the job's id there, the sequence number
+        # of its submit record, and for replayed jobs the CUPS ids it was
+        # sent as and the spooled raster
+        self.spool_id = None
+        self.journal_seq = 0
+        self.handles = None
+        self.raster = None
+
+    def render(self):
+        """Return the bands of the page, the image is dithered lazily.
+
+        Image and caption end up in one raster, so they are a single job that
+        nothing else can interleave with.
+        """
+        photo = caption = None
+        if self.image is not None:
+            gray = printing.prepare_gray(self.image, order=self.order, lut=printing.DEFAULT_CURVE)
+            photo = printing.iter_dither(gray, self.method)
+        if self.text and self.text.strip():
+            caption = printing.render_caption(self.text)
+        return printing.iter_page(photo, caption, self.caption)
+
+    def cache_key(self):
+        """Hash of the image content and everything that affects the raster."""
+        if self._key is None:
+            self._key = self._hash()
+        return self._key
+
+    def _hash(self):
+        digest = hashlib.blake2b(digest_size=20)
+        if isinstance(self.image, np.ndarray):
+            frame = np.ascontiguousarray(self.image)
+            digest.update(f"{frame.shape} {frame.dtype}".encode())
+            digest.update(frame.data)
+        elif isinstance(self.image, bytes):
+            digest.update(self.image)
+        elif self.image is not None:
+            with open(self.image, "rb") as file:
+                for chunk in iter(lambda: file.read(1 << 20), b""):
+                    digest.update(chunk)
+        settings = (
+            RASTER_VERSION,
+            self.order,
+            self.method,
+            self.text if self.text and self.text.strip() else "",
+            self.caption,
+            printing.PRINTER_DOTS,
+            config.CAPTION_COLUMNS,
+            printing.CAPTION_FONT,
+        )
+        digest.update(repr(settings).encode())
+        digest.update(printing.DEFAULT_CURVE.tobytes())
+        return digest.hexdigest()
+
+
+class CupsBackend:
+    """Submit jobs with `lp` and poll `lpstat` until CUPS has finished them."""
+
+    name = "cups"
+
+    def __init__(self, destination="", lp=None, lpstat=None, timeout=120):
+        self.destination = destination
+        self.lp = lp or config.LP_COMMAND
+        self.lpstat = lpstat or config.LPSTAT_COMMAND
+        self.timeout = timeout
+
+    def _lp(self, args, data=None):
+        cmd = [self.lp]
+        if self.destination:
+            cmd += ["-d", self.destination]
+        result = subprocess.run(
+            cmd + args, input=data, capture_output=True, check=True, timeout=30
+        )
+        # "request id is thermal-12 (1 file(s))"
+        match = re.search(rb"request id is (\S+)", result.stdout)
+        return match.group(1).decode() if match else None
+
+    def send(self, job, bands):
+        fd, path = tempfile.mkstemp(suffix=".pbm")
+        os.close(fd)
+        try:
+            # blank paper above and below the ink is not worth spooling
+            printing.write_pbm(printing.trim_rows(np.concatenate(list(bands))), path)
+            options = printing.lp_raster_options()
+            if job.spool_id:
+                # held until `release`, once the journal has the request id:
+                # a job sent again after a crash before that can not print twice
+                options += ["-t", job.spool_id, "-H", "hold"]
+            handle = self._lp(options + [path])
+        finally:
+            os.remove(path)
+        return [handle] if handle else []
+
+    def release(self, handles):
+        """Let CUPS print the jobs `send` held."""
+        for handle in handles:
+            try:
+                subprocess.run(
+                    [self.lp, "-i", handle, "-H", "resume"],
+                    capture_output=True,
+                    check=True,
+                    timeout=30,
+                )
+            except subprocess.CalledProcessError:
+                # released before a crash and maybe finished already
+                pass
+
+    def status(self, recheck=30.0):
+        """"" when the destination can print, else why not (paper out, offline).
+
+        lpstat always answers, unlike a printer asked directly, so `recheck`
+        is not needed here.
+        """
+        cmd = [self.lpstat, "-l", "-p"] + ([self.destination] if self.destination else [])
+        try:
+            result = subprocess.run(cmd, capture_output=True, timeout=10)
+        except (OSError, subprocess.TimeoutExpired) as error:
+            return f"offline ({error})"
+        if result.returncode != 0:
+            return "offline (" + result.stderr.decode(errors="replace").strip() + ")"
+        text = result.stdout.decode(errors="replace").lower()
+        # "Alerts:" lists the IPP printer-state-reasons
+        if "media-empty" in text or "media-needed" in text:
+            return "paper out"
+        if " disabled " in text or "offline-report" in text:
+            return "offline"
+        return ""
+
+    def wait(self, handles):
+        deadline = time.monotonic() + self.timeout
+        while handles and time.monotonic() < deadline:
+            try:
+                result = subprocess.run(
+                    [self.lpstat, "-W", "not-completed", "-o"],
+                    capture_output=True,
+                    timeout=10,
+                )
+            except OSError:
+                return
+            active = result.stdout.decode(errors="replace").split()
+            handles = [h for h in handles if h in active]
+            if handles:
+                time.sleep(0.5)
+        if handles:
+            raise TimeoutError(f"CUPS did not finish {', '.join(handles)}")
+
+
+class EscPosBackend:
+    """Stream jobs straight to an ESC/POS device."""
+
+    name = "escpos"
+
+    def __init__(self, device=None):
+        from escpos import EscPosPrinter
+
+        self.printer = EscPosPrinter(device)
+
+    def send(self, job, bands):
+        with self.printer:
+            return self.printer.print_raster(bands)
+
+    def wait(self, stats):
+        self.printer.wait_idle()
+
+    def status(self, recheck=30.0):
+        with self.printer:
+            return self.printer.query_status(recheck=recheck)
+
+
+class Preparation:
+    """A job rendered ahead of time on its own thread, cancellable between bands."""
+
+    def __init__(self, job):
+        self.job = job
+        self.bits = None
+        self.error = None
+        self.cancelled = threading.Event()
+        self.done = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="print-prepare", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        span = timing.span("print_prepare")
+        try:
+            bands = []
+            for band in self.job.render():
+                if self.cancelled.is_set():
+                    span.end(cancelled=True)
+                    return
+                bands.append(band)
+            self.bits = np.concatenate(bands)
+            span.end()
+        except Exception as error:
+            self.error = error
+            span.end(error=type(error).__name__)
+        finally:
+            self.done.set()
+
+    def cancel(self):
+        self.cancelled.set()
+
+
+def make_cache():
+    if not config.RASTER_CACHE_DIR:
+        return None
+    from raster_cache import RasterCache
+
+    return RasterCache(
+        config.RASTER_CACHE_DIR, config.RASTER_CACHE_BYTES, config.RASTER_CACHE_ITEMS
+    )
+
+
+def make_journal():
+    if not config.SPOOL_DIR:
+        return None
+    from journal import Journal
+
+    return Journal(config.SPOOL_DIR)
+
+
+def make_backend():
+    if config.PRINTER_DEVICE:
+        return EscPosBackend(config.PRINTER_DEVICE)
+    return CupsBackend()
+
+
+def make_backends():
+    """The configured pool: device paths print directly, other names via CUPS."""
+    names = [name.strip() for name in config.PRINTERS.split(",") if name.strip()]
+    if not names:
+        return [make_backend()]
+    return [EscPosBackend(name) if name.startswith("/") else CupsBackend(name) for name in names]
+
+
+class PrinterFault(Exception):
+    """The printer reported that it can not print right now."""
+
+
+class JobError(Exception):
+    """The job itself can not be printed, e.g. its image is corrupt."""
+
+
+class Printer:
+    """One printer of the pool, with its own job queue, worker and statistics."""
+
+    def __init__(self, backend, name=None):
+        self.backend = backend
+        self.name = (
+            name
+            or getattr(backend, "destination", "")
+            or getattr(getattr(backend, "printer", None), "device", "")
+            or backend.name
+        )
+        self.jobs = queue.Queue()
+        # jobs handed to this printer and not finished yet
+        self.load = 0
+        self.fault = ""
+        self.fault_until = 0.0
+        self.printed = 0
+        self.failures = 0
+        self.busy = 0.0
+        self.started = time.monotonic()
+        self.worker = None
+        # when the backend was last asked for its status
+        self.checked = 0.0
+
+    def faulted(self):
+        return bool(self.fault) and time.monotonic() < self.fault_until
+
+    def set_fault(self, fault, seconds):
+        self.fault = fault
+        self.fault_until = time.monotonic() + seconds
+
+    def check(self, recheck, every_job=True):
+        """Ask the backend for paper-out or offline, return the fault or "".
+
+        Unless `every_job`, a printer that was fine is only asked again
+        after `recheck` seconds or once a job failed on it.
+        """
+        status = getattr(self.backend, "status", None)
+        if status is None:
+            # nothing to ask, a failed printer is only avoided by `_pick`
+            return ""
+        now = time.monotonic()
+        if not every_job and not self.fault and now < self.checked + recheck:
+            return ""
+        self.checked = now
+        try:
+            fault = status(recheck)
+        except Exception as error:
+            fault = f"offline ({error})"
+        if fault:
+            self.set_fault(fault, recheck)
+        else:
+            self.fault = ""
+        return fault
+
+    def stats(self):
+        minutes = (time.monotonic() - self.started) / 60
+        return {
+            "name": self.name,
+            "printed": self.printed,
+            "failures": self.failures,
+            "load": self.load,
+            "fault": self.fault if self.faulted() else "",
+            "seconds_per_print": self.busy / self.printed if self.printed else None,
+            "prints_per_minute": self.printed / minutes if minutes else 0.0,
+        }
+
+
+class PrintQueue(QObject):
+    # job id, state, detail message
+    job_changed = pyqtSignal(int, str, str)
+
+    def __init__(
+        self,
+        backend=None,
+        max_attempts=3,
+        retry_delay=2.0,
+        cache=False,
+        recheck=30.0,
+        journal=False,
+        parent=None,
+    ):
+        super().__init__(parent)
+        # a backend, a list of backends for a pool, or None for the configured ones
+        if backend is None:
+            backends = make_backends()
+        elif isinstance(backend, (list, tuple)):
+            backends = list(backend)
+        else:
+            backends = [backend]
+        self.printers = [Printer(b) for b in backends]
+        self.backend = self.printers[0].backend
+        # False picks the configured cache, None disables caching
+        self.cache = make_cache() if cache is False else cache
+        # False picks the configured spool journal, None disables it
+        self.journal = make_journal() if journal is False else journal
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        # seconds before a faulted printer without a status query is tried again
+        self.recheck = recheck
+        self._lock = threading.Lock()
+        self._preparation = None
+        self._stopping = threading.Event()
+        for printer in self.printers:
+            printer.worker = threading.Thread(
+                target=self._run, args=(printer,), name=f"print-{printer.name}", daemon=True
+            )
+            printer.worker.start()
+        if self.journal is not None:
+            self._replay()
+
+    def submit(self, job):
+        job.submitted = time.monotonic()
+        if self.journal is not None:
+            # the input is spooled by the journal thread, the worker waits
+            # for the record before printing
+            preparation = self._preparation
+            ready = preparation is not None and preparation.job is job and preparation.done.is_set()
+            job.journal_seq = self.journal.submit(job, preparation.bits if ready else None)
+        self._set_state(job, QUEUED)
+        self._dispatch(job, self._pick())
+        return job
+
+    def _replay(self):
+        """Submit the jobs the journal has no final state for."""
+        for record in self.journal.unfinished:
+            try:
+                image = self.journal.load_input(record)
+            except OSError as error:
+                image = None
+                record["error"] = f"input lost: {error}"
+            job = PrintJob(
+                image=image,
+                text=record.get("text"),
+                order=record.get("order", "RGB"),
+                caption=record.get("caption", "below"),
+                method=record.get("method", "floyd-steinberg"),
+            )
+            job.spool_id = record["id"]
+            job.handles = record.get("handles")
+            job.raster = self.journal.raster_path(record)
+            job.submitted = time.monotonic()
+            if record.get("error") and job.raster is None:
+                job.error = record["error"]
+                self._set_state(job, FAILED, job.error)
+                continue
+            self._set_state(job, QUEUED, "replayed")
+            self._dispatch(job, self._pick())
+
+    def prepare(self, job):
+        """Start rendering `job` in the background, before it is submitted.
+
+        Submitting the same job object later uses the result, or waits for it
+        if it is not finished yet.  Only the latest preparation is kept.
+        """
+        self.cancel_preparation()
+        self._preparation = Preparation(job)
+        return self._preparation
+
+    def cancel_preparation(self):
+        preparation, self._preparation = self._preparation, None
+        if preparation is not None:
+            preparation.cancel()
+
+    def pending(self):
+        return sum(printer.jobs.qsize() for printer in self.printers)
+
+    def stop(self, timeout=None):
+        self.cancel_preparation()
+        self._stopping.set()
+        for printer in self.printers:
+            printer.jobs.put(None)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for printer in self.printers:
+            remaining = None if deadline is None else max(0, deadline - time.monotonic())
+            printer.worker.join(remaining)
+        if self.journal is not None:
+            self.journal.close()
+
+    def stats(self):
+        return [printer.stats() for printer in self.printers]
+
+    def format_stats(self):
+        lines = []
+        for s in self.stats():
+            line = f"{s['name']}: {s['printed']} prints, {s['prints_per_minute']:.1f}/min"
+            if s["seconds_per_print"] is not None:
+                line += f", {s['seconds_per_print']:.1f} s each"
+            if s["failures"]:
+                line += f", {s['failures']} failed"
+            if s["fault"]:
+                line += f", {s['fault']}"
+            lines.append(line)
+        return "\n".join(lines)
+
+    def _pick(self, exclude=None):
+        """The least loaded printer that is not faulted, None if there is none.
+
+        Without `exclude` a faulted printer is picked when all of them are,
+        the job then waits there until the printer recovers.
+        """
+        candidates = [p for p in self.printers if p is not exclude]
+        healthy = [p for p in candidates if not p.faulted()]
+        if not healthy and exclude is not None:
+            return None
+        return min(healthy or candidates, key=lambda p: p.load)
+
+    def _dispatch(self, job, printer):
+        with self._lock:
+            printer.load += 1
+        printer.jobs.put(job)
+
+    def _set_state(self, job, state, detail=""):
+        job.state = state
+        job.detail = detail
+        if self.journal is not None and job.spool_id is not None:
+            self._journal_state(job, state)
+        self.job_changed.emit(job.id, state, detail)
+
+    def _journal_state(self, job, state):
+        if state == SENT:
+            self.journal.wait(self.journal.record(job, state, handles=job.handles))
+        elif state in (DONE, FAILED):
+            if self._stopping.is_set() and state == FAILED:
+                # cut short by the shutdown, printed after the next start
+                return
+            # the spooled files are needed until the final state is durable
+            self.journal.wait(self.journal.record(job, state))
+            self.journal.discard(job)
+
+    def _run(self, printer):
+        while not self._stopping.is_set():
+            job = printer.jobs.get()
+            if job is None:
+                break
+            try:
+                self._process(printer, job)
+            finally:
+                with self._lock:
+                    printer.load -= 1
+
+    def _bands(self, job):
+        """The bands of `job`, prepared ahead, spooled or cached when possible.
+
+        Also returns what to call once the backend took the bands: it hands
+        the raster to the cache and the journal, or None.
+        """
+        with self._lock:
+            preparation = self._preparation
+            if preparation is not None and preparation.job is job:
+                self._preparation = None
+            else:
+                preparation = None
+        if preparation is not None:
+            preparation.done.wait()
+            bits = preparation.bits
+            if bits is not None:
+                # the journal spooled this raster when the job was submitted
+                key = job.cache_key() if self.cache is not None else None
+                return [bits], "prepared", lambda: self._keep(job, bits, key, False)
+        if job.raster is not None:
+            return [printing.read_pbm(job.raster)], "spooled", None
+        key = cached = None
+        if self.cache is not None:
+            key = job.cache_key()
+            bits = self.cache.get(key)
+            if bits is not None:
+                return [bits], "hit", None
+            cached = "miss"
+        spool = self.journal is not None and job.spool_id is not None
+        if key is None and not spool:
+            return job.render(), cached, None
+        done = []
+
+        def keep():
+            # a backend that stopped early did not print all of the raster
+            if done and done[-1] is None:
+                self._keep(job, np.concatenate(done[:-1]), key, spool)
+
+        return self._collect(job.render(), done), cached, keep
+
+    def _collect(self, bands, done):
+        # passes the bands through as they are made and keeps them in `done`,
+        # which ends in None once the backend took all of them
+        for band in bands:
+            done.append(band)
+            yield band
+        done.append(None)
+
+    def _job_errors(self, bands):
+        # an error while the bands are made is the job's, not the printer's
+        try:
+            yield from bands
+        except Exception as error:
+            raise JobError(str(error) or type(error).__name__) from error
+
+    def _keep(self, job, bits, key, spool):
+        """Cache and/or spool the raster of a sent job, neither may fail it."""
+        if key is not None:
+            try:
+                self.cache.put(key, bits)
+            except OSError as error:
+                print(f"raster not cached: {error}", file=sys.stderr)
+        if spool:
+            self.journal.save_raster(job, bits)
+
+    def _process(self, printer, job):
+        backend = printer.backend
+        try:
+            # a pool needs the status to steer jobs away from a printer that
+            # can not print, a single printer only gets asked now and then
+            fault = printer.check(self.recheck, every_job=len(self.printers) > 1)
+            if fault:
+                raise PrinterFault(fault)
+            job.attempts += 1
+            started = time.monotonic()
+            if self.journal is not None:
+                self.journal.wait(job.journal_seq)
+            if job.handles is not None:
+                # sent before a crash, only the wait for it is left
+                handle = job.handles
+            else:
+                self._set_state(job, RENDERING, printer.name)
+                with timing.span(
+                    "print_submit", backend=backend.name, printer=printer.name
+                ) as span:
+                    # dithering is lazy, it happens while the backend sends
+                    try:
+                        bands, cached, keep = self._bands(job)
+                    except Exception as error:
+                        raise JobError(str(error) or type(error).__name__) from error
+                    handle = backend.send(job, self._job_errors(bands))
+                    span.end(cache=cached)
+                if keep is not None:
+                    keep()
+                # the ids of a CUPS job, nothing to wait for on a direct printer
+                job.handles = handle if isinstance(handle, list) else []
+            if isinstance(handle, list):
+                detail = ", ".join(handle)
+            else:
+                detail = str(handle or "")
+            self._set_state(job, SENT, f"{printer.name}: {detail}" if detail else printer.name)
+            release = getattr(backend, "release", None)
+            if release is not None and job.spool_id is not None:
+                # the sent record is durable, a crash from here on waits for
+                # these handles instead of sending the job again
+                release(handle)
+            with timing.span("spooler", backend=backend.name, printer=printer.name):
+                backend.wait(handle)
+            printer.printed += 1
+            printer.busy += time.monotonic() - started
+            timing.record(
+                "print_job",
+                time.monotonic() - job.submitted,
+                attempts=job.attempts,
+                printer=printer.name,
+            )
+            self._set_state(job, DONE, printer.name)
+        except JobError as error:
+            # no other attempt or printer can print it, and the printer is fine
+            job.error = str(error)
+            self._set_state(job, FAILED, job.error)
+        except Exception as error:
+            job.error = str(error) or type(error).__name__
+            # once the backend took the job a retry only waits for it again,
+            # sending it twice would print it twice (e.g. after paper-out)
+            if not isinstance(error, PrinterFault):
+                printer.failures += 1
+                printer.set_fault(job.error, self.recheck)
+            self._failover(printer, job)
+
+    def _failover(self, printer, job):
+        if self._stopping.is_set() or job.attempts >= self.max_attempts:
+            self._set_state(job, FAILED, job.error)
+            return
+        # a sent job is only waited for where it was sent
+        sent = job.handles is not None
+        other = None if sent else self._pick(exclude=printer)
+        if other is not None:
+            self._set_state(job, QUEUED, f"{printer.name}: {job.error}, moved to {other.name}")
+            self._dispatch(job, other)
+            return
+        # nowhere else to go: wait here, paper-out waits do not count as attempts
+        self._set_state(job, QUEUED, f"retry {job.attempts}: {printer.name}: {job.error}")
+        if self._stopping.wait(self.retry_delay * max(1, job.attempts)):
+            self._set_state(job, FAILED, job.error)
+            return
+        self._dispatch(job, printer if sent else self._pick())
@@ -0,0 +1,355 @@
+"""Print preparation for the thermal printer.
+
+Turns a captured image (a file or a camera frame array) into a 1-bit raster
+at the printer's native dot width, so the printer or CUPS only has to move
+bits instead of decoding, scaling and halftoning a multi-megapixel JPEG.
+"""
+
+import io
+
+import numpy as np
+
+import config
+
+# 58mm thermal printers have a 384 dot head at 203 dpi
+PRINTER_DOTS = 384
+PRINTER_DPI = 203
+
+DITHER_METHODS = ("floyd-steinberg", "atkinson", "ordered")
+
+# error diffusion kernels: (divisor, ((row offset, column offset, weight), ...))
+_KERNELS = {
+    "floyd-steinberg": (16, ((0, 1, 7), (1, -1, 3), (1, 0, 5), (1, 1, 1))),
+    # atkinson only diffuses 6/8 of the error, which keeps highlights clean
+    "atkinson": (8, ((0, 1, 1), (0, 2, 1), (1, -1, 1), (1, 0, 1), (1, 1, 1), (2, 0, 1))),
+}
+
+_BAYER_8 = np.array(
+    [
+        [0, 32, 8, 40, 2, 34, 10, 42],
+        [48, 16, 56, 24, 50, 18, 58, 26],
+        [12, 44, 4, 36, 14, 46, 6, 38],
+        [60, 28, 52, 20, 62, 30, 54, 22],
+        [3, 35, 11, 43, 1, 33, 9, 41],
+        [51, 19, 59, 27, 49, 17, 57, 25],
+        [15, 47, 7, 39, 13, 45, 5, 37],
+        [63, 31, 55, 23, 61, 29, 53, 21],
+    ],
+    dtype=np.float32,
+)
+_BAYER_THRESHOLDS = (_BAYER_8 + 0.5) * (256 / 64)
+
+
+def to_grayscale(frame, order="RGB"):
+    """Convert an HxW, HxWx3 or HxWx4 uint8 array to HxW uint8 luma.
+
+    Picamera2's "RGB888"/"XRGB8888" formats are laid out as BGR(X) in memory,
+    pass order="BGR" for those.
+    """
+    frame = np.asarray(frame)
+    if frame.ndim == 2:
+        return frame.astype(np.uint8, copy=False)
+    if order == "BGR":
+        b, g, r = frame[..., 0], frame[..., 1], frame[..., 2]
+    else:
+        r, g, b = frame[..., 0], frame[..., 1], frame[..., 2]
+    # integer BT.601 weights (sum 256) avoid a float copy of the full frame
+    luma = r * np.uint16(77) + g * np.uint16(150) + b * np.uint16(29)
+    return (luma >> 8).astype(np.uint8)
+
+
+# `to_grayscale` order of the memory layout of Picamera2's stream formats
+FORMAT_ORDERS = {"RGB888": "BGR", "XRGB8888": "BGR", "BGR888": "RGB", "XBGR8888": "RGB"}
+
+
+def check_size(size, width=PRINTER_DOTS, landscape=True):
+    """Raise ValueError if an image of `size` (w, h) is too large to print.
+
+    Checked before decoding, a narrow strip of an image would otherwise
+    be scaled up to the print width as thousands of float rows.
+    """
+    w, h = size
+    if w < 1 or h < 1:
+        raise ValueError(f"empty image ({w}x{h})")
+    if w * h > config.MAX_IMAGE_PIXELS:
+        raise ValueError(f"image of {w}x{h} has more than {config.MAX_IMAGE_PIXELS} pixels")
+    if landscape and w > h:
+        w, h = h, w
+    rows = round(h * width / w)
+    if rows > config.MAX_PRINT_ROWS:
+        raise ValueError(
+            f"image of {size[0]}x{size[1]} would print {rows} dot rows long,"
+            f" more than {config.MAX_PRINT_ROWS}"
+        )
+
+
+def load_gray(path, width=PRINTER_DOTS, landscape=True):
+    """Decode an image file straight to grayscale.
+
+    For JPEGs the decoder is asked for a reduced size, so libjpeg only
+    reconstructs as many DCT coefficients as needed for the print width.
+    """
+    from PIL import Image
+
+    with Image.open(path) as img:
+        check_size(img.size, width, landscape)
+        # the short side may become the printer width in landscape mode
+        short = max(1, min(img.size))
+        scale = width / short
+        img.draft("L", (int(img.size[0] * scale), int(img.size[1] * scale)))
+        return np.asarray(img.convert("L"))
+
+
+def _box_reduce(gray, factor):
+    if factor <= 1:
+        return gray
+    h = gray.shape[0] // factor * factor
+    w = gray.shape[1] // factor * factor
+    blocks = gray[:h, :w].reshape(h // factor, factor, w // factor, factor)
+    return blocks.mean(axis=(1, 3), dtype=np.float32)
+
+
+def _linear_axis(n_in, n_out):
+    pos = (np.arange(n_out, dtype=np.float32) + 0.5) * (n_in / n_out) - 0.5
+    pos = np.clip(pos, 0, n_in - 1)
+    lo = np.floor(pos).astype(np.intp)
+    hi = np.minimum(lo + 1, n_in - 1)
+    return lo, hi, pos - lo
+
+
+def resize(gray, width):
+    """Resize a grayscale array to `width` columns, keeping the aspect ratio.
+
+    Large downscales are done with an integer box filter first and the
+    remaining fraction with separable linear interpolation.
+    """
+    h, w = gray.shape
+    height = max(1, round(h * width / w))
+    reduced = _box_reduce(gray, min(w // width, h // height))
+    rh, rw = reduced.shape
+    if (rh, rw) == (height, width):
+        return np.asarray(reduced, dtype=np.float32)
+    reduced = np.asarray(reduced, dtype=np.float32)
+    lo, hi, frac = _linear_axis(rw, width)
+    cols = reduced[:, lo] * (1 - frac) + reduced[:, hi] * frac
+    lo, hi, frac = _linear_axis(rh, height)
+    return cols[lo] * (1 - frac)[:, None] + cols[hi] * frac[:, None]
+
+
+def tone_curve(gamma=1.0, contrast=1.0, brightness=0.0):
+    """Return a 256 entry lookup table applying gamma, contrast and brightness."""
+    x = np.arange(256, dtype=np.float32) / 255
+    x = x ** (1 / gamma)
+    x = (x - 0.5) * contrast + 0.5 + brightness
+    return np.clip(np.round(x * 255), 0, 255).astype(np.uint8)
+
+
+def _diffuse_bands(gray, method, band_height):
+    divisor, taps = _KERNELS[method]
+    h, w = gray.shape
+    # pad two columns on each side and two rows below so that every tap of
+    # every pixel lands inside the buffer
+    stride = w + 4
+    buf = np.zeros((h + 2, stride), dtype=np.float32)
+    buf[:h, 2 : w + 2] = gray
+    flat = buf.ravel()
+    out = np.zeros((h, w), dtype=bool)
+    out_flat = out.ravel()
+    offsets = [(dy * stride + dx, weight / divisor) for dy, dx, weight in taps]
+    rows = np.arange(h)
+
+    # Pixel (y, x) only receives error from pixels left of it or in the rows
+    # above, all of which lie on an earlier anti-diagonal t = x + 2y.  Every
+    # pixel on one diagonal is independent, so a diagonal is one vector step.
+    emitted = 0
+    for t in range(w + 2 * (h - 1)):
+        y0 = max(0, (t - w + 2) // 2)
+        y1 = min(h - 1, t // 2)
+        ys = rows[y0 : y1 + 1]
+        xs = t - 2 * ys
+        idx = ys * stride + xs + 2
+        old = flat[idx]
+        ink = old < 128
+        out_flat[ys * w + xs] = ink
+        err = np.where(ink, old, old - 255)
+        for offset, weight in offsets:
+            flat[idx + offset] += err * weight
+        # row y is finished once its last pixel (t = w - 1 + 2y) is done
+        finished = (t - w + 1) // 2 + 1 if t >= w - 1 else 0
+        if finished - emitted >= band_height:
+            yield out[emitted:finished]
+            emitted = finished
+    if emitted < h:
+        yield out[emitted:]
+
+
+def bayer_thresholds(h, w):
+    """The ordered dither threshold of every pixel of an h x w image."""
+    reps = (-(-h // 8), -(-w // 8))
+    return np.tile(_BAYER_THRESHOLDS, reps)[:h, :w]
+
+
+def _ordered_bands(gray, band_height):
+    h, w = gray.shape
+    thresholds = bayer_thresholds(h, w)
+    for y in range(0, h, band_height):
+        yield gray[y : y + band_height] < thresholds[y : y + band_height]
+
+
+def iter_dither(gray, method="floyd-steinberg", band_height=24):
+    """Dither a grayscale array, yielding finished bands of ink (True) rows.
+
+    Bands are yielded as soon as every pixel in them is final, so a streaming
+    backend can start sending the top of the image while the rest is still
+    being processed.
+    """
+    if method == "ordered":
+        return _ordered_bands(np.asarray(gray, dtype=np.float32), band_height)
+    if method not in _KERNELS:
+        raise ValueError(f"unknown dither method {method!r}")
+    return _diffuse_bands(gray, method, band_height)
+
+
+def dither(gray, method="floyd-steinberg"):
+    """Dither a grayscale array to a boolean raster, True meaning ink."""
+    return np.concatenate(list(iter_dither(gray, method, band_height=max(1, gray.shape[0]))))
+
+
+def prepare_gray(source, width=PRINTER_DOTS, landscape=True, order="RGB", lut=None):
+    """Grayscale, rotate, resize and tone map `source` for the print head.
+
+    `source` is an image file path, the bytes of an image file or a frame
+    array.  With `landscape` a wide
+    image is turned by 90 degrees so it runs along the paper, like
+    `lp -o landscape` did.  Images above the size limits of `check_size`
+    raise ValueError.
+    """
+    if isinstance(source, np.ndarray):
+        check_size((source.shape[1], source.shape[0]), width, landscape)
+        gray = to_grayscale(source, order)
+    elif isinstance(source, bytes):
+        gray = load_gray(io.BytesIO(source), width, landscape)
+    else:
+        gray = load_gray(source, width, landscape)
+    if landscape and gray.shape[1] > gray.shape[0]:
+        gray = np.rot90(gray)
+    gray = resize(gray, width)
+    if lut is not None:
+        gray = lut[np.round(gray).astype(np.uint8)]
+    return gray
+
+
+def prepare(source, width=PRINTER_DOTS, method="floyd-steinberg", landscape=True, order="RGB", lut=None):
+    """Full pipeline: return the boolean print raster for `source`."""
+    if lut is None:
+        lut = DEFAULT_CURVE
+    return dither(prepare_gray(source, width, landscape, order, lut), method)
+
+
+def render_caption(text, width=PRINTER_DOTS, columns=None):
+    """Rasterize `text` into a boolean block `width` dots wide.
+
+    Lines are wrapped at `columns` characters in a monospace font, exactly
+    like the preview of the description editor.  A paragraph starting with
+    "# " is a heading, printed at twice the size with half the columns.
+    Glyphs come from a cached atlas, see glyphs.py.
+    """
+    from glyphs import atlas
+    from textlayout import wrap_text
+
+    columns = columns or config.CAPTION_COLUMNS
+    blocks = []
+    for paragraph in text.strip("\n").split("\n"):
+        scale = 1
+        if paragraph.startswith("# "):
+            paragraph, scale = paragraph[2:], 2
+        cols = max(1, columns // scale)
+        cell = width // cols
+        # a cell twice as high as wide, like the printer's 12x24 Font A
+        glyphs = atlas(CAPTION_FONT, cell, 2 * cell)
+        block = glyphs.render(wrap_text(paragraph, cols), cols)
+        if block.shape[1] < width:
+            block = np.pad(block, ((0, 0), (0, width - block.shape[1])))
+        blocks.append(block)
+    return np.concatenate(blocks)
+
+
+def iter_page(photo_bands=None, caption=None, position="below", gap=16):
+    """Yield the bands of one page: the photo with the caption block above or below."""
+    width = PRINTER_DOTS if caption is None else caption.shape[1]
+    if caption is not None and position == "above":
+        yield caption
+        yield np.zeros((gap, width), dtype=bool)
+    if photo_bands is not None:
+        yield from photo_bands
+    if caption is not None and position != "above":
+        yield np.zeros((gap, width), dtype=bool)
+        yield caption
+
+
+def row_runs(bits):
+    """Yield (inked, start, stop) for the maximal runs of blank and inked rows."""
+    ink = bits.any(axis=1)
+    if not len(ink):
+        return
+    edges = np.flatnonzero(ink[1:] != ink[:-1]) + 1
+    bounds = [0, *edges.tolist(), len(ink)]
+    for start, stop in zip(bounds[:-1], bounds[1:]):
+        yield bool(ink[start]), start, stop
+
+
+def ink_columns(bits):
+    """The first and one past the last column with ink, (0, 0) when blank."""
+    cols = np.flatnonzero(bits.any(axis=0))
+    if not len(cols):
+        return 0, 0
+    return int(cols[0]), int(cols[-1]) + 1
+
+
+def trim_rows(bits):
+    """Drop the blank rows above and below the ink, keeping at least one row."""
+    rows = np.flatnonzero(bits.any(axis=1))
+    if not len(rows):
+        return bits[:1]
+    return bits[rows[0] : rows[-1] + 1]
+
+
+def pack_rows(bits):
+    """Pack a boolean raster into bytes, 8 dots per byte, MSB first."""
+    return np.packbits(bits, axis=1)
+
+
+def pbm_bytes(bits):
+    """The raster as the contents of a binary PBM file."""
+    h, w = bits.shape
+    return f"P4\n{w} {h}\n".encode("ascii") + pack_rows(bits).tobytes()
+
+
+def write_pbm(bits, path):
+    """Write the raster as a binary PBM, which CUPS prints without halftoning."""
+    with open(path, "wb") as file:
+        file.write(pbm_bytes(bits))
+    return path
+
+
+def read_pbm(path):
+    """Read a binary PBM written by `write_pbm` back into a boolean raster."""
+    with open(path, "rb") as file:
+        magic, size = file.readline(), file.readline()
+        if magic.strip() != b"P4":
+            raise ValueError(f"{path} is not a binary PBM")
+        w, h = (int(v) for v in size.split())
+        data = np.frombuffer(file.read(), dtype=np.uint8)
+    rows = data[: h * ((w + 7) // 8)].reshape(h, (w + 7) // 8)
+    return np.unpackbits(rows, axis=1, count=w).astype(bool)
+
+
+def lp_raster_options():
+    """Options telling CUPS to print the raster dot for dot."""
+    return ["-o", f"ppi={PRINTER_DPI}"]
+
+
+CAPTION_FONT = "/usr/share/fonts/truetype/dejavu/DejaVuSansMono.ttf"
+
+# thermal paper darkens quickly, lift the mid tones a bit
+DEFAULT_CURVE = tone_curve(gamma=1.4, contrast=1.1)
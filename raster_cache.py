@@ -0,0 +1,131 @@
+"""Cache of print-ready rasters, keyed by image content and print settings.
+
+A reprint or an extra copy of the same photo with the same caption skips
+grayscale conversion, scaling, dithering and caption rendering entirely.
+Rasters are kept as PBM files in a size-bounded directory, evicted least
+recently used first, with the last few also held packed in memory.
+"""
+
+import collections
+import os
+import tempfile
+import threading
+
+import numpy as np
+
+import printing
+
+
+class RasterCache:
+    def __init__(self, directory, max_bytes=64 * 1024 * 1024, memory_items=8):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.memory_items = memory_items
+        self._lock = threading.Lock()
+        # key -> (packed rows, width), most recently used last
+        self._memory = collections.OrderedDict()
+        # key -> file size, least recently used first
+        self._disk = collections.OrderedDict()
+        self._disk_bytes = 0
+        self.memory_hits = self.disk_hits = self.misses = self.evictions = 0
+        entries = []
+        for name in os.listdir(directory):
+            if name.endswith(".tmp"):
+                # left behind by a crash in `put`
+                os.remove(os.path.join(directory, name))
+            elif name.endswith(".pbm"):
+                st = os.stat(os.path.join(directory, name))
+                entries.append((st.st_mtime, name[:-4], st.st_size))
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_bytes += size
+        self._enforce_budget()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.pbm")
+
+    def _remember(self, key, bits):
+        self._memory[key] = (printing.pack_rows(bits), bits.shape[1])
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def get(self, key):
+        """Return the cached raster for `key`, or None."""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                packed, width = self._memory[key]
+                self.memory_hits += 1
+                if key in self._disk:
+                    self._disk.move_to_end(key)
+                return np.unpackbits(packed, axis=1, count=width).astype(bool)
+            if key in self._disk:
+                try:
+                    bits = printing.read_pbm(self._path(key))
+                except (OSError, ValueError):
+                    self._disk_bytes -= self._disk.pop(key)
+                else:
+                    self._disk.move_to_end(key)
+                    # the file time is the LRU order for the next start
+                    os.utime(self._path(key))
+                    self._remember(key, bits)
+                    self.disk_hits += 1
+                    return bits
+            self.misses += 1
+            return None
+
+    def put(self, key, bits):
+        path = self._path(key)
+        # written under a temporary name of its own, so a crash never leaves
+        # half a raster and two workers putting the same key do not collide
+        fd, tmp = tempfile.mkstemp(suffix=".tmp", dir=self.directory)
+        os.close(fd)
+        try:
+            printing.write_pbm(bits, tmp)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+        size = os.path.getsize(path)
+        with self._lock:
+            self._disk_bytes += size - self._disk.pop(key, 0)
+            self._disk[key] = size
+            self._remember(key, bits)
+            self._enforce_budget()
+
+    def _enforce_budget(self):
+        while self._disk_bytes > self.max_bytes and len(self._disk) > 1:
+            key, size = self._disk.popitem(last=False)
+            self._disk_bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._disk),
+                "bytes": self._disk_bytes,
+            }
+
+    def format_stats(self):
+        s = self.stats()
+        return (
+            f"raster cache: {s['hit_rate']:.0%} hits ({s['memory_hits']} memory,"
+            f" {s['disk_hits']} disk, {s['misses']} misses), {s['entries']} rasters,"
+            f" {s['bytes'] / 1024:.0f} kB, {s['evictions']} evicted"
+        )
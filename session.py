@@ -0,0 +1,115 @@
+"""Session store: collision-free photo names and an SQLite index.
+
+Every archived photo gets a row with its file, description, print count and
+timestamps, together with a small JPEG thumbnail, so the gallery never has
+to open the full-size images.
+"""
+
+import collections
+import io
+import os
+import sqlite3
+import time
+
+import numpy as np
+
+THUMBNAIL_SIZE = 160
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS photos (
+    id INTEGER PRIMARY KEY,
+    file TEXT NOT NULL UNIQUE,
+    description TEXT NOT NULL DEFAULT '',
+    created REAL NOT NULL,
+    printed INTEGER NOT NULL DEFAULT 0,
+    last_printed REAL,
+    thumbnail BLOB
+);
+CREATE INDEX IF NOT EXISTS photos_created ON photos (created);
+"""
+
+Photo = collections.namedtuple(
+    "Photo", "id file description created printed last_printed"
+)
+_COLUMNS = ", ".join(Photo._fields)
+
+
+def make_thumbnail(frame, size=THUMBNAIL_SIZE, order="BGR"):
+    """Encode a frame as a JPEG at most `size` pixels wide or high."""
+    from PIL import Image
+
+    h, w = frame.shape[:2]
+    # subsample with a stride first, so a 12 MP frame is never copied whole
+    step = max(1, min(h, w) // (2 * size))
+    small = frame[::step, ::step]
+    if small.ndim == 3:
+        small = small[..., 2::-1] if order == "BGR" else small[..., :3]
+    image = Image.fromarray(np.ascontiguousarray(small))
+    image.thumbnail((size, size))
+    data = io.BytesIO()
+    image.save(data, "JPEG", quality=80)
+    return data.getvalue()
+
+
+class SessionStore:
+    def __init__(self, directory, index_name="session.sqlite"):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self._db = sqlite3.connect(os.path.join(directory, index_name))
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+
+    def close(self):
+        self._db.close()
+
+    def _reserve(self, created, description, thumbnail):
+        # the UNIQUE file column makes the name reservation atomic, a suffix
+        # is added for shots within the same second or files already on disk
+        stem = time.strftime("%d_%m_%Y_%H_%M_%S", time.localtime(created)) + "_image"
+        for n in range(1, 1000):
+            name = stem if n == 1 else f"{stem}_{n}"
+            path = os.path.join(self.directory, f"{name}.jpg")
+            if os.path.exists(path):
+                continue
+            try:
+                with self._db:
+                    cursor = self._db.execute(
+                        "INSERT INTO photos (file, description, created, thumbnail)"
+                        " VALUES (?, ?, ?, ?)",
+                        (path, description, created, thumbnail),
+                    )
+            except sqlite3.IntegrityError:
+                continue
+            return Photo(cursor.lastrowid, path, description, created, 0, None)
+        raise RuntimeError(f"no free file name for {stem}")
+
+    def add(self, frame, description="", order="BGR"):
+        """Index a new photo and return it, the caller writes the file."""
+        return self._reserve(time.time(), description, make_thumbnail(frame, order=order))
+
+    def record_print(self, photo_id, description=None):
+        with self._db:
+            self._db.execute(
+                "UPDATE photos SET printed = printed + 1, last_printed = ?,"
+                " description = COALESCE(?, description) WHERE id = ?",
+                (time.time(), description, photo_id),
+            )
+
+    def get(self, photo_id):
+        row = self._db.execute(
+            f"SELECT {_COLUMNS} FROM photos WHERE id = ?", (photo_id,)
+        ).fetchone()
+        return Photo(*row) if row else None
+
+    def count(self):
+        return self._db.execute("SELECT COUNT(*) FROM photos").fetchone()[0]
+
+    def page(self, offset=0, limit=24):
+        """Return [(photo, thumbnail JPEG bytes)], newest first."""
+        rows = self._db.execute(
+            f"SELECT {_COLUMNS}, thumbnail FROM photos"
+            " ORDER BY created DESC, id DESC LIMIT ? OFFSET ?",
+            (limit, offset),
+        )
+        return [(Photo(*row[:-1]), row[-1]) for row in rows]
@@ -0,0 +1,64 @@
+"""Photo strip mode: several frames from the running stream on one print.
+
+The frames are grabbed from the stream the camera is already running, so
+there is no mode switch between shots, and every frame is reduced to the
+printer width as soon as it arrives.  Grabbing and composing happen on a
+worker thread, the viewfinder keeps running in between.
+
+This needs a main stream at print resolution, the "dual" and "zsl" capture
+modes; in "switch" mode main is the small preview stream and strips are off.
+"""
+
+import numpy as np
+from PyQt5.QtCore import QThread, pyqtSignal
+
+import printing
+
+
+def compose_strip(grays, width=printing.PRINTER_DOTS, gap=16):
+    """Stack grayscale frames of equal width into one tall strip with white gaps."""
+    parts = []
+    for i, gray in enumerate(grays):
+        if i:
+            parts.append(np.full((gap, width), 255, dtype=np.uint8))
+        parts.append(np.clip(np.round(gray), 0, 255).astype(np.uint8))
+    return np.concatenate(parts)
+
+
+class StripWorker(QThread):
+    # shot number (1 based) and number of shots, emitted right before a grab
+    shot = pyqtSignal(int, int)
+    # the composed strip as a grayscale array at the printer width
+    strip_ready = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+    def __init__(self, picam2, shots=4, interval=3.0, order=None, parent=None):
+        super().__init__(parent)
+        self.picam2 = picam2
+        self.shots = shots
+        self.interval = interval
+        if order is None:
+            # the byte order of the format the main stream runs with
+            fmt = picam2.camera_config["main"].get("format")
+            order = printing.FORMAT_ORDERS.get(fmt, "BGR")
+        self.order = order
+
+    def run(self):
+        grays = []
+        try:
+            for i in range(self.shots):
+                if i:
+                    # sleep in small steps so the strip can be cancelled
+                    for _ in range(int(self.interval * 10)):
+                        if self.isInterruptionRequested():
+                            return
+                        self.msleep(100)
+                self.shot.emit(i + 1, self.shots)
+                frame = self.picam2.capture_array("main")
+                grays.append(
+                    printing.prepare_gray(frame, landscape=False, order=self.order)
+                )
+        except Exception as error:
+            self.failed.emit(str(error) or type(error).__name__)
+            return
+        self.strip_ready.emit(compose_strip(grays))
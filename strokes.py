@@ -0,0 +1,205 @@
+"""Stroke model with memory bounded undo/redo for the Drawing dialog.
+
+Strokes are kept as compact point arrays.  Before a stroke touches a tile of
+the image, that tile is copied once, so undoing the stroke only restores the
+tiles it touched instead of a full image copy.  Tiles of the oldest strokes
+are dropped when the history exceeds its byte budget; undoing that far back
+falls back to replaying the stroke vectors onto the base image.
+"""
+
+import numpy as np
+from PyQt5.QtCore import QPointF, QRect, QRectF, Qt
+from PyQt5.QtGui import QColor, QImage, QPainter, QPen, QPolygonF
+
+TILE = 128
+
+
+class Stroke:
+    def __init__(self, width, color):
+        self.width = width
+        self.color = QColor(color).rgb()
+        self._pending = []
+        # Nx2 float32 image coordinates once the stroke is finished
+        self.points = np.zeros((0, 2), dtype=np.float32)
+
+    def extend(self, points):
+        self._pending.extend((p.x(), p.y()) for p in points)
+
+    def finish(self):
+        if self._pending:
+            new = np.array(self._pending, dtype=np.float32).reshape(-1, 2)
+            self.points = np.concatenate([self.points, new])
+            self._pending = []
+
+    def __len__(self):
+        return len(self.points) + len(self._pending)
+
+    @property
+    def nbytes(self):
+        return self.points.nbytes
+
+    def pen(self, scale=1.0):
+        return QPen(QColor(self.color), self.width * scale, Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin)
+
+    def bounds(self, points=None):
+        points = self.points if points is None else points
+        margin = self.width / 2 + 2
+        lo = points.min(axis=0) - margin
+        hi = points.max(axis=0) + margin
+        return QRectF(float(lo[0]), float(lo[1]), float(hi[0] - lo[0]), float(hi[1] - lo[1]))
+
+    def paint(self, painter, scale=1.0):
+        self.finish()
+        painter.setPen(self.pen(scale))
+        painter.drawPolyline(QPolygonF([QPointF(x * scale, y * scale) for x, y in self.points]))
+
+
+class StrokeHistory:
+    def __init__(self, image, base=None, budget=16 * 1024 * 1024):
+        # the working image, painted in place
+        self.image = image
+        # the image "clear" goes back to, None for a blank white canvas
+        self.base = base
+        self.budget = budget
+        self.strokes = []
+        # before-tiles of each applied stroke, None once evicted
+        self._tiles = []
+        self._redo = []
+        self.tile_bytes = 0
+
+    def can_undo(self):
+        return bool(self.strokes)
+
+    def can_redo(self):
+        return bool(self._redo)
+
+    def begin(self, width, color, start):
+        """Start a stroke at `start` (image coordinates)."""
+        self._redo = []
+        stroke = Stroke(width, color)
+        stroke.extend([start])
+        self.strokes.append(stroke)
+        self._tiles.append({})
+
+    def paint_segment(self, points):
+        """Continue the current stroke through `points`, returning the dirty rect."""
+        stroke = self.strokes[-1]
+        last = stroke._pending[-1] if stroke._pending else stroke.points[-1]
+        segment = [QPointF(*last)] + list(points)
+        stroke.extend(points)
+        coords = np.array([(p.x(), p.y()) for p in segment], dtype=np.float32)
+        rect = stroke.bounds(coords).toAlignedRect()
+        self._save_tiles(self._tiles[-1], rect)
+        painter = QPainter(self.image)
+        painter.setPen(stroke.pen())
+        painter.drawPolyline(QPolygonF(segment))
+        painter.end()
+        self._enforce_budget()
+        return rect
+
+    def end(self):
+        stroke = self.strokes[-1]
+        stroke.finish()
+        if len(stroke) < 2:
+            # a tap without movement painted nothing
+            self.strokes.pop()
+            self._drop_tiles(self._tiles.pop())
+
+    def undo(self):
+        """Take back the last stroke, returning the dirty rect."""
+        if not self.strokes:
+            return None
+        stroke = self.strokes.pop()
+        tiles = self._tiles.pop()
+        self._redo.append(stroke)
+        if tiles is None:
+            self._replay()
+            return self.image.rect()
+        painter = QPainter(self.image)
+        painter.setCompositionMode(QPainter.CompositionMode_Source)
+        dirty = QRect()
+        for (tx, ty), tile in tiles.items():
+            painter.drawImage(tx * TILE, ty * TILE, tile)
+            dirty = dirty.united(QRect(tx * TILE, ty * TILE, tile.width(), tile.height()))
+        painter.end()
+        self._drop_tiles(tiles)
+        return dirty
+
+    def redo(self):
+        if not self._redo:
+            return None
+        stroke = self._redo.pop()
+        tiles = {}
+        rect = stroke.bounds().toAlignedRect()
+        self._save_tiles(tiles, rect)
+        painter = QPainter(self.image)
+        stroke.paint(painter)
+        painter.end()
+        self.strokes.append(stroke)
+        self._tiles.append(tiles)
+        self._enforce_budget()
+        return rect
+
+    def reset(self):
+        """Go back to the base image and forget all strokes."""
+        self.strokes = []
+        self._tiles = []
+        self._redo = []
+        self.tile_bytes = 0
+        self._paint_base(self.image, 1.0)
+
+    def render(self, scale):
+        """Render base and strokes at `scale`, e.g. for the printer's dot width."""
+        size = self.image.size() * scale
+        image = QImage(size, QImage.Format.Format_RGB32)
+        self._paint_base(image, scale)
+        painter = QPainter(image)
+        painter.setRenderHint(QPainter.Antialiasing)
+        for stroke in self.strokes:
+            stroke.paint(painter, scale)
+        painter.end()
+        return image
+
+    @property
+    def nbytes(self):
+        return self.tile_bytes + sum(s.nbytes for s in self.strokes + self._redo)
+
+    def _paint_base(self, image, scale):
+        if self.base is None:
+            image.fill(Qt.white)
+            return
+        painter = QPainter(image)
+        painter.setCompositionMode(QPainter.CompositionMode_Source)
+        painter.setRenderHint(QPainter.SmoothPixmapTransform)
+        painter.drawImage(image.rect(), self.base, self.base.rect())
+        painter.end()
+
+    def _replay(self):
+        self._paint_base(self.image, 1.0)
+        painter = QPainter(self.image)
+        for stroke in self.strokes:
+            stroke.paint(painter)
+        painter.end()
+
+    def _save_tiles(self, tiles, rect):
+        rect = rect.intersected(self.image.rect())
+        if rect.isEmpty():
+            return
+        for ty in range(rect.top() // TILE, rect.bottom() // TILE + 1):
+            for tx in range(rect.left() // TILE, rect.right() // TILE + 1):
+                if (tx, ty) not in tiles:
+                    tile = self.image.copy(tx * TILE, ty * TILE, TILE, TILE)
+                    tiles[(tx, ty)] = tile
+                    self.tile_bytes += tile.sizeInBytes()
+
+    def _drop_tiles(self, tiles):
+        if tiles:
+            self.tile_bytes -= sum(tile.sizeInBytes() for tile in tiles.values())
+
+    def _enforce_budget(self):
+        # never evict the stroke that is being drawn
+        for i in range(len(self._tiles) - 1):
+            if self.tile_bytes <= self.budget:
+                break
+            self._drop_tiles(self._tiles[i])
+            self._tiles[i] = None
@@ -0,0 +1,119 @@
+"""Printer column text layout with incremental reflow.
+
+The description is only ever edited at its end (the on-screen keyboard has
+no cursor keys), so the buffer keeps every paragraph as its list of wrapped
+printer lines and a keystroke only re-wraps the last one or two lines.
+Greedy wrapping decides each break from the text before it, so that is
+enough to stay identical to wrapping the whole text from scratch.  Headings
+("# " paragraphs) print at twice the size and wrap at half the columns, they
+are short and re-wrapped whole.
+"""
+
+import re
+
+# Font A of the common 58mm ESC/POS printers is 12x24 dots, 384 / 12 = 32
+# columns, Font B (9x17) gives 42
+PRINTER_COLUMNS = 32
+
+_TOKEN = re.compile(r"\S+ *| +")
+
+
+def wrap(paragraph, columns=PRINTER_COLUMNS):
+    """Greedily wrap one paragraph into lines of at most `columns` characters.
+
+    Spaces stay attached to the end of their line, so "".join(lines) gives
+    back the paragraph exactly; words longer than a line are split.
+    """
+    lines = []
+    line = ""
+    for token in _TOKEN.findall(paragraph):
+        word = token.rstrip(" ")
+        if len(line) + len(word) <= columns:
+            line += token
+            continue
+        if line:
+            lines.append(line)
+            line = ""
+        while len(token.rstrip(" ")) > columns:
+            lines.append(token[:columns])
+            token = token[columns:]
+        line = token
+    lines.append(line)
+    return lines
+
+
+def wrap_text(text, columns=PRINTER_COLUMNS):
+    """Wrap text with newlines into display lines, trailing spaces removed."""
+    return [
+        line.rstrip(" ") for paragraph in text.split("\n") for line in wrap(paragraph, columns)
+    ]
+
+
+def wrap_paragraph(paragraph, columns=PRINTER_COLUMNS):
+    """Wrap one paragraph like the printer does, a heading at half the columns.
+
+    The "# " of a heading stays at the start of its first line.
+    """
+    if not paragraph.startswith("# "):
+        return wrap(paragraph, columns)
+    lines = wrap(paragraph[2:], max(1, columns // 2))
+    lines[0] = "# " + lines[0]
+    return lines
+
+
+class TextBuffer:
+    def __init__(self, text="", columns=PRINTER_COLUMNS):
+        self.columns = columns
+        self.set_text(text)
+
+    def set_text(self, text):
+        self.paragraphs = [wrap_paragraph(p, self.columns) for p in text.split("\n")]
+        self.line_count = sum(len(p) for p in self.paragraphs)
+
+    @property
+    def text(self):
+        return "\n".join("".join(lines) for lines in self.paragraphs)
+
+    def __len__(self):
+        return sum(len(line) for lines in self.paragraphs for line in lines) + len(self.paragraphs) - 1
+
+    def append(self, chars):
+        for char in chars:
+            if char == "\n":
+                self.paragraphs.append([""])
+                self.line_count += 1
+                continue
+            lines = self.paragraphs[-1]
+            self._rewrap(lines, 1, lines[-1] + char)
+
+    def backspace(self):
+        lines = self.paragraphs[-1]
+        if lines == [""]:
+            if len(self.paragraphs) > 1:
+                self.paragraphs.pop()
+                self.line_count -= 1
+            return
+        # the shortened word may now fit on the line before
+        tail = min(2, len(lines))
+        self._rewrap(lines, tail, "".join(lines[-tail:])[:-1])
+
+    def _rewrap(self, lines, tail, text):
+        head = lines[0] if tail < len(lines) else text
+        if head.startswith("# ") or lines[0].startswith("# "):
+            text = "".join(lines[:-tail]) + text
+            tail = len(lines)
+            new = wrap_paragraph(text, self.columns)
+        else:
+            new = wrap(text, self.columns)
+        self.line_count += len(new) - tail
+        lines[-tail:] = new
+
+    def lines(self, last=None):
+        """Return display lines, only the `last` ones if given."""
+        out = []
+        for lines in reversed(self.paragraphs):
+            for line in reversed(lines):
+                out.append(line.rstrip(" "))
+                if last is not None and len(out) >= last:
+                    return out[::-1]
+        return out[::-1]
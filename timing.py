@@ -0,0 +1,139 @@
+"""Timing spans for the capture-and-print workflow.
+
+Every stage (countdown, capture, mode switch, archive write, description
+save, print render/submission, spooler completion) is recorded as one JSON
+line in a rotating log when THERMAL_TIMING_LOG names a file.  When it is not
+set, `span` hands out a shared no-op object, so the hooks cost one function
+call.  `python timing.py [log]` prints p50/p95 per stage.
+"""
+
+import json
+import logging
+import logging.handlers
+import os
+import sys
+import time
+
+import config
+
+ENABLED = bool(config.TIMING_LOG)
+_logger = None
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def end(self, **fields):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Span:
+    __slots__ = ("stage", "start", "fields", "ended")
+
+    def __init__(self, stage, fields):
+        self.stage = stage
+        self.fields = fields
+        self.ended = False
+        self.start = time.monotonic()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end(error=exc_type.__name__ if exc_type else None)
+        return False
+
+    def end(self, **fields):
+        # callbacks may try to end a span twice, only the first one counts
+        if self.ended:
+            return
+        self.ended = True
+        record(self.stage, time.monotonic() - self.start, **self.fields, **fields)
+
+
+def span(stage, **fields):
+    """Start timing `stage`, end it with `.end()` or use it as a context manager."""
+    if not ENABLED:
+        return NULL_SPAN
+    return Span(stage, fields)
+
+
+def _get_logger():
+    global _logger
+    if _logger is None:
+        logger = logging.getLogger("thermalprinter.timing")
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+        handler = logging.handlers.RotatingFileHandler(
+            config.TIMING_LOG, maxBytes=config.TIMING_LOG_BYTES, backupCount=3
+        )
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        _logger = logger
+    return _logger
+
+
+def record(stage, seconds, **fields):
+    if not ENABLED:
+        return
+    entry = {"ts": round(time.time(), 3), "stage": stage, "ms": round(seconds * 1000, 2)}
+    entry.update((k, v) for k, v in fields.items() if v is not None)
+    _get_logger().info(json.dumps(entry))
+
+
+def read(path=None):
+    """Yield the entries of the log and its rotated backups, oldest first."""
+    path = path or config.TIMING_LOG
+    for name in [f"{path}.{i}" for i in (3, 2, 1)] + [path]:
+        if not os.path.exists(name):
+            continue
+        with open(name) as file:
+            for line in file:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def summary(entries):
+    """Return {stage: (count, p50 ms, p95 ms)}."""
+    stages = {}
+    for entry in entries:
+        stages.setdefault(entry["stage"], []).append(entry["ms"])
+    return {
+        stage: (len(ms), percentile(ms, 0.5), percentile(ms, 0.95))
+        for stage, ms in stages.items()
+    }
+
+
+def format_summary(stats, separator="\n"):
+    return separator.join(
+        f"{stage}: p50 {p50:.0f} ms, p95 {p95:.0f} ms (n={n})"
+        for stage, (n, p50, p95) in sorted(stats.items())
+    )
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else config.TIMING_LOG
+    if not path:
+        sys.exit("usage: timing.py LOG (or set THERMAL_TIMING_LOG)")
+    stats = summary(read(path))
+    print(f"{'stage':>22} {'n':>6} {'p50 ms':>10} {'p95 ms':>10}")
+    for stage, (n, p50, p95) in sorted(stats.items()):
+        print(f"{stage:>22} {n:6d} {p50:10.1f} {p95:10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Live viewfinder in the printer's black-and-white look.
+
+Frames come from the small lores stream, whose YUV420 layout starts with the
+luma plane, so no color conversion is needed.  The print tone curve and the
+ordered dither thresholds are applied with two vectorized operations into
+preallocated buffers, and the result is shown as a 1-bit QImage.  The work
+happens on a worker thread that drops frames while the GUI is still showing
+the previous one, so a slow display never holds up the camera.
+"""
+
+import time
+
+import numpy as np
+from PyQt5.QtCore import Qt, QThread, pyqtSignal
+from PyQt5.QtGui import QImage, QPixmap
+from PyQt5.QtWidgets import QLabel
+
+import printing
+import timing
+
+# how often the mean processing time is reported, in seconds
+REPORT_INTERVAL = 2.0
+
+
+class ThermalLook:
+    """Turn luma frames into 1-bit images, reusing buffers between frames."""
+
+    def __init__(self, lut=None):
+        self.lut = printing.DEFAULT_CURVE if lut is None else lut
+        self._shape = None
+
+    def _allocate(self, h, w):
+        # the Bayer thresholds are whole numbers, so uint8 compares exactly
+        # like the float thresholds of the printed raster
+        self._thresholds = printing.bayer_thresholds(h, w).astype(np.uint8)
+        self._toned = np.empty((h, w), dtype=np.uint8)
+        self._paper = np.empty((h, w), dtype=bool)
+        self._shape = (h, w)
+
+    def __call__(self, luma):
+        """Return the packed rows of the dithered frame, 1 meaning paper."""
+        if luma.shape != self._shape:
+            self._allocate(*luma.shape)
+        np.take(self.lut, luma, out=self._toned)
+        np.greater_equal(self._toned, self._thresholds, out=self._paper)
+        return np.packbits(self._paper, axis=1)
+
+    def qimage(self, luma):
+        packed = self(luma)
+        h, w = luma.shape
+        image = QImage(packed.data, w, h, packed.strides[0], QImage.Format.Format_Mono)
+        image.setColorTable([0xFF000000, 0xFFFFFFFF])
+        # keep the buffer alive as long as the wrapper
+        image.ndarray = packed
+        return image
+
+
+class ViewfinderWorker(QThread):
+    # the dithered frame and the milliseconds it took
+    frame_ready = pyqtSignal(object, float)
+
+    def __init__(self, picam2, parent=None):
+        super().__init__(parent)
+        self.picam2 = picam2
+        self.look = ThermalLook()
+        # set while the GUI has not shown the last frame yet
+        self.busy = False
+
+    def run(self):
+        while not self.isInterruptionRequested():
+            try:
+                frame = self.picam2.capture_array("lores")
+                w, h = self.picam2.camera_config["lores"]["size"]
+            except Exception:
+                # no lores stream, e.g. while the sensor is in the still mode
+                self.msleep(100)
+                continue
+            if self.busy:
+                continue
+            start = time.perf_counter()
+            image = self.look.qimage(frame[:h, :w])
+            self.busy = True
+            self.frame_ready.emit(image, (time.perf_counter() - start) * 1000)
+
+
+class ThermalViewfinder(QLabel):
+    # a line like "thermal viewfinder: 0.4 ms/frame, 29 fps"
+    report = pyqtSignal(str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setAlignment(Qt.AlignCenter)
+        self.setMinimumSize(1, 1)
+        self._worker = None
+        self._frames = 0
+        self._ms = 0.0
+        self._since = time.monotonic()
+
+    def start(self, picam2):
+        if self._worker is not None:
+            return
+        self._worker = ViewfinderWorker(picam2, self)
+        self._worker.frame_ready.connect(self.show_frame)
+        self._frames, self._ms, self._since = 0, 0.0, time.monotonic()
+        self._worker.start()
+
+    def stop(self):
+        worker, self._worker = self._worker, None
+        if worker is not None:
+            worker.requestInterruption()
+            worker.wait(1000)
+
+    def show_frame(self, image, ms):
+        self.setPixmap(
+            QPixmap.fromImage(image).scaled(
+                self.size(), Qt.KeepAspectRatio, Qt.FastTransformation
+            )
+        )
+        if self._worker is not None:
+            self._worker.busy = False
+        self._frames += 1
+        self._ms += ms
+        elapsed = time.monotonic() - self._since
+        if elapsed >= REPORT_INTERVAL:
+            mean = self._ms / self._frames
+            timing.record("viewfinder_frame", mean / 1000, fps=round(self._frames / elapsed, 1))
+            self.report.emit(
+                f"thermal viewfinder: {mean:.1f} ms/frame, {self._frames / elapsed:.0f} fps"
+            )
+            self._frames, self._ms, self._since = 0, 0.0, time.monotonic()
@@ -0,0 +1,136 @@
+"""Zero-shutter-lag capture: the sharpest of the last frames of the stream.
+
+A worker copies every frame of the main stream into a ring of preallocated
+slots, sized by a memory budget, and scores it right away with the variance
+of the Laplacian of a downscaled luma copy (blur and motion both lower it).
+When the countdown ends the best scored frame in the ring is the photo, so
+a blink or a shake at that exact instant does not end up on paper and no
+capture has to be waited for.
+"""
+
+import threading
+import time
+
+import numpy as np
+from PyQt5.QtCore import QThread
+
+# the sharpness is measured on a copy about this many pixels wide
+SHARPNESS_WIDTH = 320
+
+
+class Sharpness:
+    """Laplacian variance of frames of one shape, with reused buffers."""
+
+    def __init__(self, shape, width=SHARPNESS_WIDTH):
+        h, w = shape[:2]
+        self.step = max(1, w // width)
+        self.shape = (h // self.step, w // self.step)
+        self._small = np.empty(self.shape, dtype=np.float32)
+        self._laplacian = np.empty((self.shape[0] - 2, self.shape[1] - 2), dtype=np.float32)
+
+    def __call__(self, frame):
+        # the green channel (index 1 in RGB, BGR and XBGR alike) as luma
+        plane = frame[..., 1] if frame.ndim == 3 else frame
+        s = self.step
+        h, w = self.shape
+        small = self._small
+        # box downscale as a sum of strided views, no full-size temporaries
+        small.fill(0)
+        for dy in range(s):
+            for dx in range(s):
+                small += plane[dy : h * s : s, dx : w * s : s]
+        lap = self._laplacian
+        np.multiply(small[1:-1, 1:-1], 4, out=lap)
+        lap -= small[:-2, 1:-1]
+        lap -= small[2:, 1:-1]
+        lap -= small[1:-1, :-2]
+        lap -= small[1:-1, 2:]
+        # undo the box sum's scale, so scores compare across settings
+        return float(lap.var()) / (s * s) ** 2
+
+
+class FrameRing:
+    """The last frames of one shape in preallocated slots, with their scores."""
+
+    def __init__(self, shape, dtype=np.uint8, budget=32 * 1024 * 1024):
+        frame_bytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        self.size = max(1, budget // frame_bytes)
+        self.slots = np.empty((self.size,) + tuple(shape), dtype=dtype)
+        self.scores = np.full(self.size, -1.0)
+        self.times = np.zeros(self.size)
+        self.sharpness = Sharpness(shape)
+        self.count = 0
+        self._next = 0
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self):
+        return self.slots.nbytes
+
+    def push(self, frame):
+        """Copy `frame` into the oldest slot and score it."""
+        with self._lock:
+            slot = self._next
+            np.copyto(self.slots[slot], frame)
+            self.scores[slot] = self.sharpness(self.slots[slot])
+            self.times[slot] = time.monotonic()
+            self._next = (slot + 1) % self.size
+            self.count += 1
+
+    def best(self):
+        """A copy of the sharpest frame, its score and age, None while empty."""
+        with self._lock:
+            slot = int(np.argmax(self.scores))
+            if self.scores[slot] < 0:
+                return None
+            age = time.monotonic() - self.times[slot]
+            return self.slots[slot].copy(), float(self.scores[slot]), age
+
+
+class ZslWorker(QThread):
+    """Feeds the main stream of a running camera into a FrameRing."""
+
+    def __init__(self, picam2, budget, parent=None):
+        super().__init__(parent)
+        self.picam2 = picam2
+        self.budget = budget
+        self.ring = None
+        self.error = None
+        # Picamera2's MappedArray copies from the camera buffer straight into
+        # a slot; without it (stand-in cameras) frames come via capture_array
+        try:
+            from picamera2 import MappedArray
+        except ImportError:
+            MappedArray = None
+        self._mapped_array = MappedArray
+
+    def _push(self, frame):
+        if self.ring is None or self.ring.slots.shape[1:] != frame.shape:
+            self.ring = FrameRing(frame.shape, frame.dtype, self.budget)
+        self.ring.push(frame)
+
+    def _push_next(self):
+        # the stream may be padded to its stride
+        w, h = self.picam2.camera_config["main"]["size"]
+        if self._mapped_array is None:
+            self._push(self.picam2.capture_array("main")[:h, :w])
+            return
+        request = self.picam2.capture_request()
+        try:
+            with self._mapped_array(request, "main") as mapped:
+                self._push(mapped.array[:h, :w])
+        finally:
+            request.release()
+
+    def run(self):
+        while not self.isInterruptionRequested():
+            try:
+                self._push_next()
+            except Exception as error:
+                # e.g. while the camera is stopped
+                self.error = str(error) or type(error).__name__
+                self.msleep(100)
+
+    def best(self):
+        ring = self.ring
+        return None if ring is None else ring.best()